@@ -1,7 +1,10 @@
 import os
 from google.adk.agents import Agent
 from google.adk.tools import FunctionTool
-from .tools import vector_search, graph_search, document_processor
+
+from rag_core.answer_cache import answer_cache_callbacks
+from rag_core.retrieval import bind_collection
+from .tools import vector_search, graph_search, context_search, document_processor
 
 # Configure the Gemini API key
 #genai.configure(api_key=os.environ["GEMINI_API_KEY"])
@@ -46,6 +49,9 @@ from .tools import vector_search, graph_search, document_processor
     # )
 
 
+# Coleção de documentos em que este agente busca
+COLLECTION = os.environ.get("AGENTRH_COLLECTION", "rh")
+
 root_agent = Agent(
     name="agentRH",
     model="gemini-2.0-flash",
@@ -55,10 +61,13 @@ root_agent = Agent(
         "mostre os parameros de pesquisa no vetorial e no graph"
         "acrescente no contexto a empresa ADN"
         "nos bancos de dados vetorial e de grafos. Sua resposta deve ser baseada SOMENTE nas informações retornadas pelas ferramentas de busca. "        
-        "Não use conhecimento externo. Primeiro, use a busca vetorial para encontrar documentos relevantes. Em seguida, use a busca de grafos para encontrar entidades e relacionamentos. "
+        "Não use conhecimento externo. Para buscar, use a ferramenta 'contextsearch', que faz a busca vetorial e a busca de grafos em uma única chamada e retorna documentos, entidades e relacionamentos. "
+        "Use 'vectorsearch' e 'graphsearch' separadamente apenas para refinar uma busca que já foi feita. "
+        "Quando a pergunta tiver códigos, números de chamado, siglas ou nomes de parâmetros, use hybrid=True. "
         "Por fim, sintetize as informações de ambas as fontes para fornecer uma resposta abrangente e bem elaborada em português."
     ),
-    tools=[vector_search.vectorsearch, graph_search.graphsearch]
+    tools=[bind_collection(context_search.contextsearch, COLLECTION), bind_collection(vector_search.vectorsearch, COLLECTION), bind_collection(graph_search.graphsearch, COLLECTION)],
+    **answer_cache_callbacks()
 )
 
 #rag_agent = create_rag_agent()
@@ -3,7 +3,10 @@ import os
 from google.adk.agents import Agent
 from google.adk.tools import FunctionTool
 
-from .tools import vector_search, graph_search, document_processor, kcs_tool
+from rag_core.answer_cache import answer_cache_callbacks
+from rag_core.retrieval import bind_collection
+
+from .tools import vector_search, graph_search, context_search, document_processor, kcs_tool
 from agentZap.tools import whatsapp_sender
 
 # Configure the Gemini API key
@@ -49,6 +52,9 @@ from agentZap.tools import whatsapp_sender
     # )
 
 
+# Coleção de documentos em que este agente busca
+COLLECTION = os.environ.get("AGENTSUPORTE_COLLECTION", "suporte")
+
 root_agent = Agent(
     name="agentSuporte",
     model="gemini-2.0-flash",
@@ -59,12 +65,15 @@ root_agent = Agent(
         "mostre os parameros de pesquisa no vetorial e no graph"
         "acrescente no contexto a empresa ADN"
         "nos bancos de dados vetorial e de grafos. Sua resposta deve ser baseada SOMENTE nas informações retornadas pelas ferramentas de busca. "        
-        "Não use conhecimento externo. Primeiro, use a busca vetorial para encontrar documentos relevantes. Em seguida, use a busca de grafos para encontrar entidades e relacionamentos. "
+        "Não use conhecimento externo. Para buscar, use a ferramenta 'contextsearch', que faz a busca vetorial e a busca de grafos em uma única chamada e retorna documentos, entidades e relacionamentos. "
+        "Use 'vectorsearch' e 'graphsearch' separadamente apenas para refinar uma busca que já foi feita. "
+        "Quando a pergunta tiver códigos, números de chamado, siglas ou nomes de parâmetros, use hybrid=True. "
         "Por fim, sintetize as informações de ambas as fontes para fornecer uma resposta abrangente e bem elaborada em português."
         "Você também possui uma ferramenta especializada para gerar artigos de conhecimento KCS a partir de números de chamados. Se o usuário pedir para analisar um chamado ou gerar um artigo, use a ferramenta 'gerar_artigo_kcs'."
         "Além disso, você tem a capacidade de enviar mensagens para o WhatsApp. Se solicitado a enviar um resumo de chamado ou qualquer informação para um número de telefone, use a ferramenta 'enviar_mensagem_whatsapp'."
     ),
-    tools=[vector_search.vectorsearch, graph_search.graphsearch, kcs_tool.gerar_artigo_kcs, whatsapp_sender.enviar_mensagem_whatsapp]
+    tools=[bind_collection(context_search.contextsearch, COLLECTION), bind_collection(vector_search.vectorsearch, COLLECTION), bind_collection(graph_search.graphsearch, COLLECTION), kcs_tool.gerar_artigo_kcs, whatsapp_sender.enviar_mensagem_whatsapp],
+    **answer_cache_callbacks()
 )
 
 #rag_agent = create_rag_agent()
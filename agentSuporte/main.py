@@ -1,16 +1,56 @@
+import asyncio
 import os
-from io import BytesIO
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Path, status
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Path, Request, status
+from fastapi.concurrency import run_in_threadpool
 from google.adk.runtime.agents import run_agent
 
-from .agent import root_agent
+from rag_core.answer_cache import get_answer_cache_stats
+from rag_core.chunk_store import check_collection
+from rag_core.db_pool import get_pool_metrics, close_pool
+from rag_core.embedding_cache import get_query_cache_stats
+from rag_core.embeddings import is_loaded, warmup
+from rag_core.extraction_cache import get_extraction_cache_stats
+from rag_core.ingestion_jobs import JobQueueFullError, close_ingestion_jobs, get_ingestion_jobs, get_ingestion_stats
+from rag_core.neo4j_driver import close_driver
+from rag_core.reranker import get_rerank_stats, rerank_enabled
+from rag_core.reranker import warmup as warmup_reranker
+from rag_core.tool_cache import get_tool_cache_stats
+from rag_core.upload import UPLOAD_FORM_BYTES, UploadError, UploadTooLargeError, read_upload, too_large_message
+
+from .agent import COLLECTION, root_agent
 from .tools import document_processor
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Optionally loads the embedding model in the background so the first
+    query does not pay for it, while the health check answers right away.
+    The cross-encoder is loaded the same way when reranking is on by default.
+    When the app stops, finishes running ingestion jobs, then releases the
+    pooled database connections.
+    """
+    if os.environ.get("EMBEDDING_WARMUP", "").lower() in ("1", "true", "yes"):
+        asyncio.get_running_loop().run_in_executor(None, warmup)
+    if rerank_enabled():
+        asyncio.get_running_loop().run_in_executor(None, warmup_reranker)
+    try:
+        yield
+    finally:
+        # Waiting for the ingestion jobs blocks, so it stays off the event loop
+        await run_in_threadpool(close_ingestion_jobs)
+        close_pool()
+        close_driver()
+
+
 app = FastAPI(
     title="RAG Agent",
     description="An agent that uses a vector and graph database for RAG.",
+    lifespan=lifespan,
 )
 
+
 @app.get("/", status_code=status.HTTP_200_OK)
 async def health_check():
     """
@@ -19,38 +59,129 @@ async def health_check():
     return {"status": "RAG Agent is running"}
 
 
-@app.post("/documents/", status_code=status.HTTP_201_CREATED)
-async def upload_document(subject: str = Form(...), file: UploadFile = File(...)):
+@app.get("/metrics", status_code=status.HTTP_200_OK)
+async def metrics():
     """
-    Uploads a document, extracts its content, and ingests it into the databases.
-    Supported formats: .pdf, .docx, .txt, .md
+    Returns runtime metrics for the shared database resources and caches.
+    """
+    return {
+        "postgres_pool": get_pool_metrics(),
+        "query_embedding_cache": get_query_cache_stats(),
+        "embedding_model_loaded": is_loaded(),
+        "ingestion_jobs": get_ingestion_stats(),
+        "extraction_cache": get_extraction_cache_stats(),
+        "reranker": get_rerank_stats(),
+        "answer_cache": get_answer_cache_stats(),
+        "tool_cache": get_tool_cache_stats(),
+    }
+
+
+def _upload_limits():
+    """Reads UPLOAD_MAX_BYTES (default 50 MiB) and UPLOAD_SPOOL_BYTES (default 1 MiB)."""
+    return (
+        int(os.environ.get("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024))),
+        int(os.environ.get("UPLOAD_SPOOL_BYTES", str(1024 * 1024))),
+    )
+
+
+async def _read_upload(request: Request, max_bytes: int, spool_bytes: int):
     """
-    file_extension = os.path.splitext(file.filename)[1].lower()
-    if file_extension not in document_processor.EXTRACTORS:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File type '{file_extension}' not supported. Supported types are {list(document_processor.EXTRACTORS.keys())}"
+    Reads the multipart upload from the request stream with
+    rag_core.upload, answering 413 when it is too large and 400 when it is
+    malformed or its file is rejected.
+    """
+    try:
+        return await read_upload(
+            request.headers.get("content-type"), request.stream(), max_bytes, spool_bytes,
+            document_processor.EXTRACTORS
         )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=str(e))
+    except UploadError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
+
+# Documented by hand because the form is parsed from the request stream
+_UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["subject", "file"],
+            "properties": {
+                "subject": {"type": "string"},
+                "file": {"type": "string", "format": "binary"},
+                "collection": {"type": "string"},
+            },
+        }}},
+    },
+}
+
+
+@app.post("/documents/", status_code=status.HTTP_202_ACCEPTED, openapi_extra=_UPLOAD_OPENAPI)
+async def upload_document(request: Request):
+    """
+    Uploads a document and queues it for ingestion into the databases.
+    The form is parsed as the body streams in, and the file is spooled into
+    a temporary file bounded by UPLOAD_MAX_BYTES after being checked by
+    extension and magic bytes. Extraction, embedding and storage run on the
+    ingestion worker pool, so the response carries a job id to poll at
+    GET /jobs/{job_id}.
+    Form fields: 'subject', 'file' and the optional 'collection', by default
+    the one this agent searches.
+    Supported formats: .pdf, .docx, .txt, .md
+    """
+    max_bytes, spool_bytes = _upload_limits()
+    # The request body includes the form fields, so this only rejects what cannot possibly fit
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + UPLOAD_FORM_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=too_large_message(max_bytes))
+
+    upload, spool = await _read_upload(request, max_bytes, spool_bytes)
     try:
-        file_stream = BytesIO(await file.read())
-        extractor = document_processor.EXTRACTORS[file_extension]
-        content = extractor(file_stream)
-        doc_id = os.path.splitext(file.filename)[0]
-        
-        result = document_processor.add_document(doc_id, content, subject)
-        
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to process file: {e}")
+        subject = upload.fields.get("subject")
+        if not subject:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing 'subject' field.")
+        collection = upload.fields.get("collection") or COLLECTION
+        try:
+            check_collection(collection)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+        doc_id = os.path.splitext(upload.filename)[0]
+        try:
+            job = get_ingestion_jobs().submit(
+                document_processor.ingest_file, spool, upload.file_extension, doc_id, subject,
+                collection=collection, description=f"{upload.filename} ({subject}, {collection})"
+            )
+        except JobQueueFullError as e:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    except BaseException:
+        spool.close()
+        raise
+
+    return {"status": "queued", "job_id": job["id"], "doc_id": doc_id, "collection": collection, "status_url": f"/jobs/{job['id']}"}
+
+
+@app.get("/jobs/{job_id}", status_code=status.HTTP_200_OK)
+async def get_job(job_id: str = Path(..., description="The ID returned by the document upload")):
+    """
+    Returns the status, current stage and result of an ingestion job.
+    """
+    job = get_ingestion_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found.")
+    return job
 
 @app.delete("/documents/{doc_id}", status_code=status.HTTP_200_OK)
 async def delete_document(doc_id: str = Path(..., description="The ID of the document to delete")):
     """
     Deletes a document from the databases.
+    The deletion blocks on both databases, so it runs in the thread pool
+    instead of on the event loop.
     """
     try:
-        result = document_processor.remove_document(doc_id)
+        result = await run_in_threadpool(document_processor.remove_document, doc_id)
         if result["status"] == "not_found":
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=result["message"])
         return result
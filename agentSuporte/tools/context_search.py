@@ -0,0 +1,36 @@
+from typing import Optional
+
+from rag_core.retrieval import combined_search
+from rag_core.tool_cache import cached_tool
+
+from .graph_search import graphsearch
+from .vector_search import vectorsearch
+
+@cached_tool
+def contextsearch(query: str, subject: Optional[str] = None, limit: int = 5,
+                  expand_graph: bool = True, hybrid: bool = False, rerank: Optional[bool] = None,
+                  max_tokens: Optional[int] = None, collection: Optional[str] = None) -> dict:
+    """Busca o contexto completo para uma pergunta em uma única chamada.
+
+    Executa a busca vetorial e a busca no grafo ao mesmo tempo e, se 'expand_graph' for
+    verdadeiro, também traz do grafo as entidades ligadas aos documentos encontrados.
+    Retorna um dicionário com 'documents' (trechos relevantes dos documentos), 'entities'
+    (entidades do grafo) e 'relationships' (relações entre documentos e entidades), sem
+    repetições. Cada item informa em 'sources' de qual busca veio.
+    Opcionalmente, pode filtrar os documentos por 'subject'. Use 'hybrid=True' para
+    perguntas com códigos, números de chamado, siglas ou nomes de parâmetros.
+    'rerank' reordena os trechos com um cross-encoder e 'max_tokens' limita o tamanho do
+    texto dos documentos (veja 'vectorsearch').
+    'collection' restringe os documentos, e os nós de documento do grafo, a uma coleção;
+    cada agente já vem ligado à sua.
+    """
+    return combined_search(
+        query,
+        vectorsearch,
+        graphsearch,
+        vector_kwargs={"subject": subject, "limit": limit, "hybrid": hybrid, "rerank": rerank,
+                       "max_tokens": max_tokens, "collection": collection},
+        graph_limit=limit,
+        expand_graph=expand_graph,
+        collection=collection,
+    )
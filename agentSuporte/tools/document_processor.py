@@ -1,100 +1,126 @@
 import os
+import threading
 from io import BytesIO
-from pypdf import PdfReader
-import docx
-import markdown
-from sentence_transformers import SentenceTransformer
+from typing import BinaryIO
 
-from .vector_search import get_db_connection
-from .graph_search import get_neo4j_connection
+from rag_core.answer_cache import invalidate_documents
+from rag_core.bulk_load import embed_in_batches
+from rag_core.chunk_store import DEFAULT_COLLECTION, check_collection, store_document_stream
+from rag_core.chunking import iter_document_chunks
+from rag_core.db_pool import pooled_connection
+from rag_core.embeddings import get_model
+from rag_core.extraction import (PAGE_EXTRACTORS, PageTextCollector, iter_docx_pages, iter_md_pages,
+                                 iter_pdf_pages, iter_txt_pages, join_pages)
+from rag_core.extraction_cache import cached_pages
+from rag_core.neo4j_driver import execute_write
+from rag_core.tool_cache import bump_corpus_version
+from rag_core.vector_index import create_collection_indexes
 
 # --- Text Extraction --- #
 
+# Each extractor yields (page_number, text) lazily, so ingestion starts with the first page
+EXTRACTORS = PAGE_EXTRACTORS
+
 def extract_text_from_pdf(file_stream: BytesIO) -> str:
-    reader = PdfReader(file_stream)
-    text = "".join(page.extract_text() for page in reader.pages)
-    return text
+    return join_pages(iter_pdf_pages(file_stream))
 
 def extract_text_from_docx(file_stream: BytesIO) -> str:
-    doc = docx.Document(file_stream)
-    text = "\n".join([para.text for para in doc.paragraphs])
-    return text
+    return join_pages(iter_docx_pages(file_stream))
 
 def extract_text_from_txt(file_stream: BytesIO) -> str:
-    return file_stream.read().decode('utf-8')
+    return join_pages(iter_txt_pages(file_stream))
 
 def extract_text_from_md(file_stream: BytesIO) -> str:
-    md_content = file_stream.read().decode('utf-8')
-    # A simple conversion to text; might need more sophisticated parsing for complex MD
-    html = markdown.markdown(md_content)
-    # This is a basic way to strip HTML, might need a library like BeautifulSoup
-    import re
-    return re.sub('<[^<]+?>', '', html)
-
-EXTRACTORS = {
-    '.pdf': extract_text_from_pdf,
-    '.docx': extract_text_from_docx,
-    '.txt': extract_text_from_txt,
-    '.md': extract_text_from_md,
-}
+    return join_pages(iter_md_pages(file_stream))
 
 # --- Data Ingestion --- #
 
-model = SentenceTransformer('all-MiniLM-L6-v2')
+EMBEDDING_BATCH_SIZE = 64
+
+# Collections whose partial ANN indexes this process already made sure exist
+_indexed_collections = set()
+_indexed_collections_lock = threading.Lock()
+
+def _no_progress(stage: str):
+    pass
+
+def _ensure_collection_indexes(collection: str):
+    with _indexed_collections_lock:
+        if collection in _indexed_collections:
+            return
+        with pooled_connection() as pg_conn:
+            create_collection_indexes(pg_conn, collection)
+        _indexed_collections.add(collection)
+
+def add_document(doc_id: str, content: str, subject: str, pages=None, progress=_no_progress,
+                 collection: str = DEFAULT_COLLECTION):
+    """Adds a document of ``collection`` to both vector and graph databases.
+
+    The content is split into token-bounded chunks that are embedded and
+    stored individually. Pass ``pages`` as an iterable of (page_number, text)
+    pairs, such as an extractor's page stream, to keep page numbers on the
+    chunks; pages are then chunked, embedded and written batch by batch as
+    they are extracted, and the new chunks replace the old ones at the end.
+    ``progress`` is called with the name of each stage as it starts.
+    """
+    check_collection(collection)
+    _ensure_collection_indexes(collection)
 
-def add_document(doc_id: str, content: str, subject: str):
-    """Adds a document to both vector and graph databases."""
     # Ingest into PostgreSQL
-    pg_conn = get_db_connection()
-    try:
-        cur = pg_conn.cursor()
-        embedding = model.encode(content)
-        cur.execute(
-            "INSERT INTO documents (id, subject, content, embedding) VALUES (%s, %s, %s, %s) ON CONFLICT (id) DO UPDATE SET subject = EXCLUDED.subject, content = EXCLUDED.content, embedding = EXCLUDED.embedding;",
-            (doc_id, subject, content, embedding)
-        )
-        pg_conn.commit()
-        cur.close()
-    finally:
-        pg_conn.close()
+    progress("embedding")
+    model = get_model()
+    collector = PageTextCollector(pages if pages is not None else [(None, content)])
+    batches = embed_in_batches(model, iter_document_chunks(collector, tokenizer=model.tokenizer), EMBEDDING_BATCH_SIZE)
+    # Batches are extracted and embedded with no connection borrowed; each is written in its own short transaction
+    chunks = store_document_stream(pooled_connection, doc_id, subject, batches, lambda: collector.text, collection)
+    progress("storing")
 
     # Ingest into Neo4j
-    neo4j_conn = get_neo4j_connection()
+    execute_write(
+        lambda tx: tx.run(
+            "MERGE (d:Document {id: $id}) SET d.name = $name, d.subject = $subject, d.collection = $collection",
+            id=doc_id, name=doc_id, subject=subject, collection=collection
+        ).consume()
+    )
+
+    # Answers and search results that may include the previous version of this document are stale
+    invalidate_documents([doc_id])
+    bump_corpus_version()
+    return {"status": "success", "doc_id": doc_id, "chunks": chunks, "pages": collector.pages_seen}
+
+def ingest_file(file_stream: BinaryIO, file_extension: str, doc_id: str, subject: str, progress=_no_progress,
+                collection: str = DEFAULT_COLLECTION):
+    """Extracts an uploaded file and adds it; meant to run as a background ingestion job.
+
+    The stream, typically the spooled temporary file of an upload, is read
+    page by page and closed when ingestion ends.
+    """
+    progress("extracting")
     try:
-        with neo4j_conn.driver.session() as session:
-            session.run(
-                "MERGE (d:Document {id: $id}) SET d.name = $name, d.subject = $subject",
-                id=doc_id, name=doc_id, subject=subject
-            )
+        pages = cached_pages(EXTRACTORS[file_extension], file_stream)
+        return add_document(doc_id, None, subject, pages=pages, progress=progress, collection=collection)
     finally:
-        neo4j_conn.close()
-    
-    return {"status": "success", "doc_id": doc_id}
+        file_stream.close()
 
 def remove_document(doc_id: str):
     """Removes a document from both vector and graph databases."""
     # Remove from PostgreSQL
-    pg_conn = get_db_connection()
-    try:
-        cur = pg_conn.cursor()
-        cur.execute("DELETE FROM documents WHERE id = %s;", (doc_id,))
-        pg_conn.commit()
-        deleted_count_pg = cur.rowcount
-        cur.close()
-    finally:
-        pg_conn.close()
+    with pooled_connection() as pg_conn:
+        with pg_conn.cursor() as cur:
+            # Chunks are removed by the ON DELETE CASCADE on document_chunks
+            cur.execute("DELETE FROM documents WHERE id = %s;", (doc_id,))
+            deleted_count_pg = cur.rowcount
 
     # Remove from Neo4j
-    neo4j_conn = get_neo4j_connection()
-    try:
-        with neo4j_conn.driver.session() as session:
-            result = session.run(
-                "MATCH (d:Document {id: $id}) DETACH DELETE d",
-                id=doc_id
-            )
-            deleted_count_neo4j = result.summary().counters.nodes_deleted
-    finally:
-        neo4j_conn.close()
+    summary = execute_write(
+        lambda tx: tx.run(
+            "MATCH (d:Document {id: $id}) DETACH DELETE d",
+            id=doc_id
+        ).consume()
+    )
+    deleted_count_neo4j = summary.counters.nodes_deleted
+    invalidate_documents([doc_id])
+    bump_corpus_version()
 
     if deleted_count_pg > 0 or deleted_count_neo4j > 0:
         return {"status": "success", "doc_id": doc_id, "message": "Document removed."}
@@ -1,65 +1,86 @@
-import os
 from typing import Optional
-import psycopg2
-from pgvector.psycopg2 import register_vector
-from sentence_transformers import SentenceTransformer
 
-# Initialize the sentence transformer model
-model = SentenceTransformer('all-MiniLM-L6-v2')
+from rag_core.chunk_store import aggregate_by_document, hybrid_search_chunks, rescore_factor, search_chunks, vector_storage
+from rag_core.context_packing import default_budget, pack_context
+from rag_core.db_pool import pooled_connection
+from rag_core.embedding_cache import cached_query_embedding
+from rag_core.embeddings import get_model
+from rag_core.reranker import rerank_candidates, rerank_enabled, rerank_rows
+from rag_core.tool_cache import cached_tool, mark_uncacheable
+from rag_core.vector_index import MAX_EF_SEARCH, apply_search_params
 
-def get_db_connection():
-    """Establishes a connection to the PostgreSQL database."""
-    conn = psycopg2.connect(
-        dbname=os.environ.get("POSTGRES_DB"),
-        user=os.environ.get("POSTGRES_USER"),
-        password=os.environ.get("POSTGRES_PASSWORD"),
-        host=os.environ.get("POSTGRES_HOST")
-    )
-    return conn
+# Trechos (chunks) candidatos buscados por documento retornado, antes da agregação
+CHUNK_CANDIDATES_PER_DOC = 4
 
-def vectorsearch(query: str, subject: Optional[str] = None, limit: int = 5) -> list[dict]:
+@cached_tool
+def vectorsearch(query: str, subject: Optional[str] = None, limit: int = 5,
+                 ef_search: Optional[int] = None, probes: Optional[int] = None,
+                 hybrid: bool = False, semantic_weight: float = 1.0, lexical_weight: float = 1.0,
+                 rerank: Optional[bool] = None, max_tokens: Optional[int] = None,
+                 max_chars: Optional[int] = None, collection: Optional[str] = None) -> list[dict]:
     """Busca documentos relevantes no banco de dados vetorial, retornando uma lista de dicionários com os resultados.
 
-    Cada dicionário contém 'id', 'subject', 'content' e 'similarity_score'.
+    A busca é feita sobre trechos (chunks) dos documentos e agregada por documento.
+    Cada dicionário contém 'id', 'subject', 'content' (apenas os trechos mais relevantes),
+    'similarity_score' e 'passages' (índice, página e score de cada trecho).
     Opcionalmente, pode filtrar por 'subject'.
+    'ef_search' (índice HNSW) e 'probes' (índice IVFFlat) aumentam o recall da busca
+    aproximada ao custo de latência; se omitidos, valem os padrões do servidor.
+    Com 'hybrid=True', combina a busca vetorial com a busca por palavras-chave (full-text
+    em português) via reciprocal rank fusion; use para códigos de chamado (ex: CH-2024-001),
+    siglas e nomes de parâmetros do ERP. 'semantic_weight' e 'lexical_weight' ajustam o peso
+    de cada lado, e o score retornado passa a ser 'rrf_score'.
+    Com 'rerank=True', busca mais candidatos e os reordena com um cross-encoder, e o score
+    passa a ser 'rerank_score'; se o orçamento de tempo estourar, mantém a ordem da busca
+    vetorial. Se omitido, segue a configuração do servidor (RERANK_ENABLED).
+    'max_tokens' e/ou 'max_chars' limitam o tamanho total do texto retornado: os trechos
+    entram por ordem de score até o limite, sem repetir texto entre trechos vizinhos ou
+    documentos duplicados, e o último trecho é recortado nas frases mais relevantes para
+    a pergunta (marcado com 'snippet'). Se omitidos, vale CONTEXT_MAX_TOKENS, se definido.
+    'collection' restringe a busca a uma coleção; cada agente já vem ligado à sua.
     """
-    conn = get_db_connection()
-    register_vector(conn)
-    cur = conn.cursor()
     print("query savastane",query)
 
-    
-    # Gerar o embedding para a consulta
-    query_embedding = model.encode(query)
+    # Gerar (ou reaproveitar do cache) o embedding da consulta antes de pegar a conexão,
+    # para não segurá-la durante o encode
+    query_embedding = cached_query_embedding(get_model(), query)
 
-    # Construir a consulta SQL dinamicamente
-    base_query = "SELECT id, subject, content, 1 - (embedding <=> %s) AS similarity_score FROM documents"
-    params = [query_embedding]
-    where_clauses = []
+    if rerank is None:
+        rerank = rerank_enabled()
+    candidates = limit * CHUNK_CANDIDATES_PER_DOC
+    if rerank:
+        candidates = max(candidates, rerank_candidates())
+    # Com VECTOR_STORAGE compacto, a primeira passada busca mais candidatos, reordenados pelo vetor completo
+    storage = vector_storage()
+    # O HNSW nunca retorna mais linhas que ef_search (padrão 40, máximo MAX_EF_SEARCH)
+    coarse_candidates = min(candidates * rescore_factor(storage), MAX_EF_SEARCH)
+    candidates = min(candidates, coarse_candidates)
+    if ef_search is None and probes is None and coarse_candidates > 40:
+        ef_search = coarse_candidates
 
-    if subject:
-        where_clauses.append("subject = %s")
-        params.append(subject)
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            apply_search_params(cur, ef_search, probes)
+            if hybrid:
+                rows = hybrid_search_chunks(cur, query, query_embedding, subject, candidates,
+                                            semantic_weight, lexical_weight,
+                                            storage=storage, candidates=coarse_candidates, collection=collection)
+            else:
+                rows = search_chunks(cur, query_embedding, subject, candidates,
+                                     storage=storage, candidates=coarse_candidates, collection=collection)
 
-    if where_clauses:
-        base_query += " WHERE " + " AND ".join(where_clauses)
+    score_key = "rrf_score" if hybrid else "similarity_score"
+    if rerank:
+        # Scored outside the pooled connection so it is not held during inference
+        rows, reranked = rerank_rows(query, rows)
+        if reranked:
+            score_key = "rerank_score"
+        elif rows:
+            # Search order kept because the model was loading or the budget ran out; a later call may rerank
+            mark_uncacheable()
 
-    base_query += " ORDER BY similarity_score DESC LIMIT %s"
-    params.append(limit)
-
-    cur.execute(base_query, tuple(params))
-    
-    # Mapear os resultados para uma lista de dicionários
-    results = []
-    for row in cur.fetchall():
-        results.append({
-            "id": row[0],
-            "subject": row[1],
-            "content": row[2],
-            "similarity_score": round(row[3], 4)
-        })
-
-    cur.close()
-    conn.close()
-
-    return results
+    if max_tokens is None and max_chars is None:
+        max_tokens = default_budget()
+    if max_tokens is not None or max_chars is not None:
+        return pack_context(rows, query, limit, max_tokens, max_chars, score_key=score_key)
+    return aggregate_by_document(rows, limit, score_key=score_key)
@@ -0,0 +1,104 @@
+import argparse
+import json
+import statistics
+import sys
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+from rag_core.chunking import chunk_document
+from rag_core.embeddings import BACKENDS, load_model
+
+# Load environment variables
+load_dotenv()
+
+SAMPLE_QUERIES = [
+    "política de viagem",
+    "como pedir reembolso de viagem?",
+    "prestação de contas",
+    "procedimento de recrutamento e seleção",
+    "treinamento e desenvolvimento",
+    "chamado CH-2024-001",
+    "experiência profissional com Oracle e PL/SQL",
+    "formação acadêmica",
+]
+
+
+def load_corpus(data_path):
+    """Returns the chunk texts of the sample documents plus the sample queries."""
+    with open(data_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    texts = [chunk['content'] for doc in data['documents'] for chunk in chunk_document(doc['content'])]
+    return texts + SAMPLE_QUERIES
+
+
+def cosine_agreement(reference, candidate):
+    """Row-wise cosine similarity between two embedding matrices."""
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    return np.sum(reference * candidate, axis=1)
+
+
+def benchmark(model, texts, batch_size, repeats):
+    """Measures batch throughput and single-query latency."""
+    model.encode(texts[:batch_size], batch_size=batch_size)  # warm-up
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model.encode(texts, batch_size=batch_size)
+    throughput = len(texts) * repeats / (time.perf_counter() - start)
+
+    latencies = []
+    for query in SAMPLE_QUERIES * repeats:
+        start = time.perf_counter()
+        model.encode(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "throughput": throughput,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def main(backends, data_path, batch_size, repeats, min_cosine):
+    """Compares embedding backends against PyTorch for parity, throughput and latency."""
+    texts = load_corpus(data_path)
+    print(f"Corpus: {len(texts)} texts from '{data_path}'.")
+
+    print("Loading reference model (torch)...")
+    reference_model = load_model("torch")
+    reference = reference_model.encode(texts, batch_size=batch_size)
+
+    parity_ok = True
+    for backend in backends:
+        model = reference_model if backend == "torch" else load_model(backend)
+        embeddings = model.encode(texts, batch_size=batch_size)
+        if embeddings.shape != reference.shape:
+            print(f"[{backend}] FAIL: embeddings have shape {embeddings.shape}, expected {reference.shape}.")
+            parity_ok = False
+            continue
+
+        agreement = cosine_agreement(reference, embeddings)
+        status = "ok" if agreement.min() >= min_cosine else "FAIL"
+        parity_ok = parity_ok and status == "ok"
+        results = benchmark(model, texts, batch_size, repeats)
+        print(
+            f"[{backend}] parity {status}: cosine min {agreement.min():.5f}, mean {agreement.mean():.5f} | "
+            f"{results['throughput']:.1f} texts/sec (batch {batch_size}) | "
+            f"query latency p50 {results['p50_ms']:.2f} ms, p95 {results['p95_ms']:.2f} ms"
+        )
+
+    return 0 if parity_ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check parity and benchmark the embedding backends.")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS), help="Backends to compare. Defaults to all.")
+    parser.add_argument("--data", default="data/sample_data.json", help="JSON file with documents. Defaults to 'data/sample_data.json'.")
+    parser.add_argument("--batch-size", type=int, default=32, help="Texts per encode batch. Defaults to 32.")
+    parser.add_argument("--repeats", type=int, default=5, help="Benchmark repetitions. Defaults to 5.")
+    parser.add_argument("--min-cosine", type=float, default=0.98, help="Minimum per-text cosine against PyTorch. Defaults to 0.98.")
+    args = parser.parse_args()
+    sys.exit(main(args.backends, args.data, args.batch_size, args.repeats, args.min_cosine))
@@ -0,0 +1,104 @@
+import argparse
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+from rag_core.chunk_store import STORAGE_COLUMNS, STORAGE_MODES, ensure_schema, ensure_storage_column, search_chunks
+from rag_core.db_pool import close_pool, pooled_connection
+from rag_core.embeddings import get_model
+from rag_core.vector_index import INDEX_METHODS, apply_search_params, create_index, index_name
+
+# Load environment variables
+load_dotenv()
+
+# Words of a chunk used as a pseudo-query when no query file is given
+QUERY_WORDS = 12
+
+
+def load_queries(conn, queries_path, sample):
+    """Returns query texts from a file (one per line) or the opening words of random chunks."""
+    if queries_path:
+        with open(queries_path, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+    with conn.cursor() as cur:
+        cur.execute("SELECT content FROM document_chunks ORDER BY random() LIMIT %s;", (sample,))
+        return [" ".join(row[0].split()[:QUERY_WORDS]) for row in cur.fetchall()]
+
+
+def exact_neighbours(conn, query_embedding, k):
+    """Ground truth: the ``k`` nearest chunks by a sequential scan over the full vectors."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT set_config('enable_indexscan', 'off', true), set_config('enable_bitmapscan', 'off', true);")
+        cur.execute(
+            "SELECT doc_id, chunk_index FROM document_chunks ORDER BY embedding <=> %s LIMIT %s;",
+            (query_embedding, k)
+        )
+        return {tuple(row) for row in cur.fetchall()}
+
+
+def storage_sizes(conn, storage, method):
+    """Bytes taken by the storage mode's column values and by its ANN index."""
+    column = STORAGE_COLUMNS[storage]
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT coalesce(sum(pg_column_size({column})), 0) FROM document_chunks;")
+        column_bytes = cur.fetchone()[0]
+        cur.execute("SELECT coalesce(pg_relation_size(to_regclass(%s)), 0);", (index_name("document_chunks", column, method),))
+        index_bytes = cur.fetchone()[0]
+    return column_bytes, index_bytes
+
+
+def main(storages, factors, k, method, queries_path, sample, ef_search):
+    """Reports recall@k, latency and size of each storage mode and rescore factor.
+
+    Missing compact columns and their indexes are created on document_chunks
+    and kept afterwards, so the chosen mode is ready to use.
+    """
+    model = get_model()
+    with pooled_connection() as conn:
+        ensure_schema(conn)
+        for storage in storages:
+            ensure_storage_column(conn, storage)
+            create_index(conn, method, "document_chunks", STORAGE_COLUMNS[storage])
+        queries = load_queries(conn, queries_path, sample)
+
+    print(f"{len(queries)} queries, recall@{k} against an exact scan of the float32 vectors ({method} indexes).")
+    embeddings = model.encode(queries)
+    with pooled_connection() as conn:
+        truth = [exact_neighbours(conn, embedding, k) for embedding in embeddings]
+
+    print(f"{'storage':<8} {'factor':>6} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'column MiB':>11} {'index MiB':>10}")
+    for storage in storages:
+        with pooled_connection() as conn:
+            column_bytes, index_bytes = storage_sizes(conn, storage, method)
+        for factor in ([1] if storage == "vector" else factors):
+            recalls, latencies = [], []
+            for embedding, expected in zip(embeddings, truth):
+                with pooled_connection() as conn:
+                    with conn.cursor() as cur:
+                        apply_search_params(cur, max(ef_search, k * factor))
+                        start = time.perf_counter()
+                        rows = search_chunks(cur, embedding, limit=k, storage=storage, candidates=k * factor)
+                        latencies.append((time.perf_counter() - start) * 1000)
+                found = {(row[0], row[2]) for row in rows}
+                recalls.append(len(found & expected) / len(expected) if expected else 1.0)
+            latencies.sort()
+            print(
+                f"{storage:<8} {factor:>6} {statistics.mean(recalls):>7.3f} {statistics.median(latencies):>8.2f} "
+                f"{latencies[max(int(len(latencies) * 0.95) - 1, 0)]:>8.2f} "
+                f"{column_bytes / 2**20:>11.2f} {index_bytes / 2**20:>10.2f}"
+            )
+    close_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare recall and size of the chunk embedding storage modes.")
+    parser.add_argument("--storages", nargs="+", choices=STORAGE_MODES, default=list(STORAGE_MODES), help="Storage modes to compare. Defaults to all.")
+    parser.add_argument("--factors", nargs="+", type=int, default=[1, 2, 4, 8, 16], help="Coarse candidates per result to rescore. Defaults to 1 2 4 8 16.")
+    parser.add_argument("--k", type=int, default=10, help="Results per query. Defaults to 10.")
+    parser.add_argument("--method", choices=INDEX_METHODS, default="hnsw", help="ANN index method. Defaults to 'hnsw'.")
+    parser.add_argument("--queries", default=None, help="Text file with one query per line. Defaults to the opening words of sampled chunks.")
+    parser.add_argument("--sample", type=int, default=200, help="Chunks sampled as queries without --queries. Defaults to 200.")
+    parser.add_argument("--ef-search", type=int, default=40, help="Minimum HNSW ef_search. Defaults to 40.")
+    args = parser.parse_args()
+    main(args.storages, args.factors, args.k, args.method, args.queries, args.sample, args.ef_search)
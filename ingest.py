@@ -1,110 +1,131 @@
+import argparse
 import json
 import os
-import psycopg2
-from pgvector.psycopg2 import register_vector
-from neo4j import GraphDatabase
-from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
 
+from rag_core.bulk_load import LOAD_METHODS, Throughput, encode_in_batches, write_documents
+from rag_core.chunk_store import DEFAULT_COLLECTION, STORAGE_COLUMNS, check_collection, ensure_schema, vector_storage
+from rag_core.chunking import chunk_document
+from rag_core.db_pool import pooled_connection, close_pool
+from rag_core.embeddings import get_model
+from rag_core.graph_index import ensure_fulltext_index
+from rag_core.graph_loader import DEFAULT_BATCH_SIZE, format_sync_stats, sync_graph
+from rag_core.neo4j_driver import close_driver, get_driver
+from rag_core.tool_cache import bump_corpus_version
+from rag_core.vector_index import INDEX_METHODS, create_collection_indexes, create_index
+
 # Load environment variables from a .env file if it exists
 load_dotenv()
 
-# --- Database Connection Setup ---
-def get_db_connection():
-    """Establishes a connection to the PostgreSQL database."""
-    return psycopg2.connect(
-        dbname=os.environ.get("POSTGRES_DB", "vectordb"),
-        user=os.environ.get("POSTGRES_USER", "user"),
-        password=os.environ.get("POSTGRES_PASSWORD", "password"),
-        host=os.environ.get("POSTGRES_HOST", "localhost")
-    )
-
-def get_neo4j_driver():
-    """Establishes a connection to the Neo4j database."""
-    uri = os.environ.get("NEO4J_URI", "bolt://localhost:7687")
-    user = os.environ.get("NEO4J_USER", "neo4j")
-    password = os.environ.get("NEO4J_PASSWORD", "password")
-    return GraphDatabase.driver(uri, auth=(user, password))
-
 # --- Data Ingestion Logic ---
-def ingest_postgres_data(conn, documents, model):
-    """Ingests documents and their embeddings into PostgreSQL."""
-    register_vector(conn)
-    cur = conn.cursor()
+def ingest_postgres_data(conn, documents, model, batch_size=64, load_method="copy", collection=DEFAULT_COLLECTION):
+    """Ingests documents, their chunks and the chunk embeddings into PostgreSQL.
 
-    cur.execute("CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, subject TEXT, content TEXT, embedding VECTOR(384));")
+    All chunks are embedded together in length-sorted batches, and the rows
+    are written in bulk with COPY (binary) or multi-row INSERTs. Documents
+    go into ``collection`` unless they name their own. Returns the
+    collections written.
+    """
+    ensure_schema(conn)
 
+    records = []
     for doc in documents:
-        embedding = model.encode(doc['content'])
-        cur.execute(
-            "INSERT INTO documents (id, subject, content, embedding) VALUES (%s, %s, %s, %s) ON CONFLICT (id) DO NOTHING;", 
-            (doc['id'], doc['subject'], doc['content'], embedding)
-        )
-    
-    conn.commit()
-    cur.close()
+        records.append({
+            "id": doc['id'],
+            "subject": doc['subject'],
+            "content": doc['content'],
+            "collection": check_collection(doc.get('collection', collection)),
+            "chunks": chunk_document(doc['content'], tokenizer=model.tokenizer),
+        })
+
+    embedding_stage = Throughput("Embedding")
+    with embedding_stage.timed():
+        texts = [chunk['content'] for record in records for chunk in record['chunks']]
+        embeddings = encode_in_batches(model, texts, batch_size)
+    embedding_stage.items = len(texts)
+
+    offset = 0
+    for record in records:
+        record['embeddings'] = embeddings[offset:offset + len(record['chunks'])]
+        offset += len(record['chunks'])
+
+    write_stage = Throughput(f"PostgreSQL write ({load_method})")
+    with write_stage.timed():
+        write_stage.rows = write_documents(conn, records, load_method)
+        conn.commit()
+    write_stage.items = len(records)
+
+    print(embedding_stage.report(unit="chunks"))
+    print(write_stage.report())
     print("PostgreSQL ingestion complete.")
+    return {record["collection"] for record in records}
 
-def ingest_neo4j_data(driver, graph_data):
-    """Ingests nodes and relationships into Neo4j."""
-    with driver.session() as session:
-        # Clear existing data
-        session.run("MATCH (n) DETACH DELETE n")
-
-        # Ingest nodes
-        for node in graph_data['nodes']:
-            session.run(
-                f"CREATE (n:{node['label']} {{id: $id, name: $name}})",
-                id=node['id'], name=node['properties']['name']
-            )
-        
-        # Ingest relationships
-        for rel in graph_data['relationships']:
-            session.run(
-                """
-                MATCH (a {{id: $source}}), (b {{id: $target}})
-                CREATE (a)-[:`{rel_type}`]->(b)
-                """ .format(rel_type=rel['type']),
-                source=rel['source'], target=rel['target']
-            )
+def ingest_neo4j_data(driver, graph_data, source, batch_size=DEFAULT_BATCH_SIZE):
+    """Syncs the nodes and relationships of ``source`` into Neo4j, writing only what changed."""
+    stats = sync_graph(driver, graph_data, source, batch_size)
+    print(format_sync_stats(stats))
+    print(f"Full-text index: {ensure_fulltext_index(driver)}.")
     print("Neo4j ingestion complete.")
 
-
-def main():
+def main(index_method="hnsw", data_path="data/sample_data.json", batch_size=64, load_method="copy",
+         graph_batch_size=DEFAULT_BATCH_SIZE, collection=DEFAULT_COLLECTION):
     """Main function to run the data ingestion."""
     print("Starting data ingestion...")
     
     # Load sample data
-    with open('data/sample_data.json', 'r', encoding='utf-8') as f:
+    with open(data_path, 'r', encoding='utf-8') as f:
         data = json.load(f)
 
     # Initialize embedding model
     print("Loading sentence transformer model...")
-    model = SentenceTransformer('all-MiniLM-L6-v2')
+    model = get_model()
 
     # Ingest data into PostgreSQL
-    pg_conn = None
     try:
-        pg_conn = get_db_connection()
-        ingest_postgres_data(pg_conn, data['documents'], model)
+        with pooled_connection() as pg_conn:
+            collections = ingest_postgres_data(pg_conn, data['documents'], model, batch_size, load_method, collection)
+            # IVFFlat needs the data in place to pick its centroids, so indexes are built after loading
+            if index_method != "none":
+                # Chunks are only indexed on the column searched by the first pass (VECTOR_STORAGE);
+                # in compact modes the full vectors are read just to rescore the candidates
+                index = create_index(pg_conn, method=index_method, table="document_chunks",
+                                     column=STORAGE_COLUMNS[vector_storage()])
+                print(f"Vector index '{index}' is ready.")
+                # Partial indexes so each agent's searches only visit its own collection
+                for name in sorted(collections):
+                    for index in create_collection_indexes(pg_conn, name, method=index_method):
+                        print(f"Vector index '{index}' is ready.")
     except Exception as e:
         print(f"Error during PostgreSQL ingestion: {e}")
     finally:
-        if pg_conn:
-            pg_conn.close()
+        close_pool()
 
     # Ingest data into Neo4j
-    neo4j_driver = None
     try:
-        neo4j_driver = get_neo4j_driver()
-        ingest_neo4j_data(neo4j_driver, data['graph'])
+        ingest_neo4j_data(get_driver(), data['graph'], os.path.basename(data_path), graph_batch_size)
     except Exception as e:
         print(f"Error during Neo4j ingestion: {e}")
     finally:
-        if neo4j_driver:
-            neo4j_driver.close()
+        close_driver()
+
+    # Search results cached by running agents are stale now
+    try:
+        with pooled_connection() as pg_conn:
+            print(f"Corpus version is now {bump_corpus_version(pg_conn)}.")
+    except Exception as e:
+        print(f"Error bumping the corpus version: {e}")
+    finally:
+        close_pool()
             
     print("Data ingestion finished.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Ingest the sample documents and graph.")
+    parser.add_argument("--index", choices=[*INDEX_METHODS, "none"], default="hnsw", help="ANN index to build on the embeddings. Defaults to 'hnsw'.")
+    parser.add_argument("--data", default="data/sample_data.json", help="JSON file with documents and graph. Defaults to 'data/sample_data.json'.")
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks encoded per embedding batch. Defaults to 64.")
+    parser.add_argument("--load-method", choices=LOAD_METHODS, default="copy", help="Bulk write strategy for PostgreSQL. Defaults to 'copy'.")
+    parser.add_argument("--collection", required=True, help="Collection for documents that do not name one: agentRH searches 'rh', agentSuporte 'suporte'.")
+    parser.add_argument("--graph-batch-size", type=int, default=DEFAULT_BATCH_SIZE, help=f"Nodes/relationships per Neo4j transaction. Defaults to {DEFAULT_BATCH_SIZE}.")
+    args = parser.parse_args()
+    main(args.index, args.data, args.batch_size, args.load_method, args.graph_batch_size, args.collection)
@@ -1,105 +1,240 @@
 import os
 import argparse
-import psycopg2
-from pgvector.psycopg2 import register_vector
-from neo4j import GraphDatabase
-from sentence_transformers import SentenceTransformer
+import multiprocessing
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
-from pypdf import PdfReader
+
+from rag_core.bulk_load import Throughput, encode_in_batches, write_documents
+from rag_core.chunk_store import DEFAULT_COLLECTION, check_collection, delete_documents, ensure_schema
+from rag_core.chunking import chunk_document
+from rag_core.db_pool import pooled_connection, close_pool
+from rag_core.embeddings import get_model
+from rag_core.extraction import iter_pdf_pages, join_pages
+from rag_core.extraction_cache import cached_pages
+from rag_core.graph_index import ensure_fulltext_index
+from rag_core.manifest import ensure_manifest, load_manifest, plan_sync, save_manifest, shared_doc_ids
+from rag_core.neo4j_driver import close_driver, execute_write, get_driver
+from rag_core.tool_cache import bump_corpus_version
+from rag_core.vector_index import create_collection_indexes
 
 # Load environment variables
 load_dotenv()
 
-# --- Database Connection Setup ---
-def get_db_connection():
-    return psycopg2.connect(
-        dbname=os.environ.get("POSTGRES_DB", "vectordb"),
-        user=os.environ.get("POSTGRES_USER", "user"),
-        password=os.environ.get("POSTGRES_PASSWORD", "password"),
-        host=os.environ.get("POSTGRES_HOST", "localhost")
-    )
-
-def get_neo4j_driver():
-    uri = os.environ.get("NEO4J_URI", "bolt://localhost:7687")
-    user = os.environ.get("NEO4J_USER", "neo4j")
-    password = os.environ.get("NEO4J_PASSWORD", "password")
-    return GraphDatabase.driver(uri, auth=(user, password))
-
 # --- PDF Processing ---
+def extract_pages_from_pdf(file_stream):
+    """Returns the text of each page as (page_number, text) pairs, numbered from 1."""
+    return list(iter_pdf_pages(file_stream))
+
 def extract_text_from_pdf(file_stream):
-    reader = PdfReader(file_stream)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() or ""
-    return text
-
-def add_document_to_db(doc_id, content, subject, model):
-    """Adds a single document to both PostgreSQL and Neo4j."""
-    pg_conn = None
-    neo4j_driver = None
+    return join_pages(iter_pdf_pages(file_stream))
+
+def extract_file(file_path, content_hash=None):
+    """Extraction stage: runs in a worker process and returns (path, pages, seconds, error).
+
+    Pages come from the shared extraction cache when this content was extracted before.
+    """
+    start = time.perf_counter()
     try:
-        # --- PostgreSQL Ingestion ---
-        pg_conn = get_db_connection()
-        register_vector(pg_conn)
-        cur = pg_conn.cursor()
-        embedding = model.encode(content)
-        cur.execute(
-            "INSERT INTO documents (id, subject, content, embedding) VALUES (%s, %s, %s, %s) ON CONFLICT (id) DO UPDATE SET subject = EXCLUDED.subject, content = EXCLUDED.content, embedding = EXCLUDED.embedding;",
-            (doc_id, subject, content, embedding)
-        )
-        pg_conn.commit()
-        cur.close()
-
-        # --- Neo4j Ingestion ---
-        neo4j_driver = get_neo4j_driver()
-        with neo4j_driver.session() as session:
-            session.run(
-                "MERGE (d:Document {id: $id}) SET d.subject = $subject MERGE (s:Subject {name: $subject}) MERGE (d)-[:IS_ABOUT]->(s)",
-                id=doc_id, subject=subject
-            )
-        return {"status": "success"}
+        with open(file_path, 'rb') as f:
+            pages = list(cached_pages(iter_pdf_pages, f, content_hash))
+        return file_path, pages, time.perf_counter() - start, None
     except Exception as e:
-        return {"status": "error", "message": str(e)}
-    finally:
-        if pg_conn: pg_conn.close()
-        if neo4j_driver: neo4j_driver.close()
+        return file_path, None, time.perf_counter() - start, str(e)
+
+def extract_all(file_paths, workers, content_hashes=None):
+    """Yields extraction results in order, keeping a bounded number of files in flight."""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        in_flight = deque()
+        for file_path in file_paths:
+            in_flight.append(executor.submit(extract_file, file_path, (content_hashes or {}).get(file_path)))
+            if len(in_flight) >= workers * 4:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+# --- Database Writes ---
+def _merge_documents(tx, rows):
+    tx.run(
+        "UNWIND $rows AS row "
+        "MERGE (d:Document {id: row.id}) SET d.subject = row.subject, d.aliases = row.aliases, d.collection = row.collection "
+        "MERGE (s:Subject {name: row.subject}) MERGE (d)-[:IS_ABOUT]->(s)",
+        rows=rows
+    ).consume()
+
+def write_batch(records):
+    """Writer stage: stores a batch of embedded documents in PostgreSQL and Neo4j."""
+    with pooled_connection() as pg_conn:
+        rows = write_documents(pg_conn, records)
+    execute_write(
+        _merge_documents,
+        [{"id": record["id"], "subject": record["subject"], "aliases": record["aliases"], "collection": record["collection"]}
+         for record in records]
+    )
+    return rows
+
+def delete_removed(doc_ids):
+    """Deletes documents whose files are gone from both PostgreSQL and Neo4j."""
+    with pooled_connection() as pg_conn:
+        deleted = delete_documents(pg_conn, doc_ids)
+    execute_write(
+        lambda tx: tx.run("UNWIND $ids AS id MATCH (d:Document {id: id}) DETACH DELETE d", ids=doc_ids).consume()
+    )
+    return deleted
+
+def embed_batch(records, model):
+    """Embedding stage: chunks a batch of documents and encodes all of their chunks together."""
+    for record in records:
+        record["chunks"] = chunk_document(record["content"], record.pop("pages"), tokenizer=model.tokenizer)
+    texts = [chunk["content"] for record in records for chunk in record["chunks"]]
+    embeddings = encode_in_batches(model, texts)
+    offset = 0
+    for record in records:
+        record["embeddings"] = embeddings[offset:offset + len(record["chunks"])]
+        offset += len(record["chunks"])
+    return len(texts)
 
-def main(pdfs_dir, subject):
-    """Main function to ingest PDF documents from a directory."""
-    print(f"Starting ingestion of PDFs from '{pdfs_dir}' for subject '{subject}'...")
+def main(pdfs_dir, subject, workers=None, batch_size=16, full=False, collection=DEFAULT_COLLECTION):
+    """Main function to ingest PDF documents from a directory.
+
+    The run is incremental: a manifest of content hashes, sizes and mtimes
+    in PostgreSQL decides which files changed, byte-identical files are
+    stored once with their other names as aliases, and documents whose
+    files were removed are deleted. ``full`` re-ingests every file.
+
+    Extraction runs on a pool of ``workers`` processes, embedding runs in
+    batches of ``batch_size`` documents in this process, and a single writer
+    thread stores each embedded batch while the next one is being encoded.
+    Documents go into ``collection``, whose partial ANN indexes are created
+    once the load is done.
+    """
+    check_collection(collection)
+    print(f"Starting ingestion of PDFs from '{pdfs_dir}' for subject '{subject}' into collection '{collection}'...")
 
     if not os.path.isdir(pdfs_dir):
         print(f"Error: Directory '{pdfs_dir}' not found.")
         return
 
-    print("Loading sentence transformer model...")
-    model = SentenceTransformer('all-MiniLM-L6-v2')
+    workers = workers or os.cpu_count() or 1
+    source = os.path.abspath(pdfs_dir)
+    file_names = [filename for filename in os.listdir(pdfs_dir) if filename.lower().endswith('.pdf')]
+
+    with pooled_connection() as pg_conn:
+        ensure_schema(pg_conn)
+        ensure_manifest(pg_conn)
+        manifest = load_manifest(pg_conn, source)
+    plan = plan_sync(pdfs_dir, file_names, manifest, subject, collection, full)
+    print(
+        f"Found {len(file_names)} PDF file(s): {len(plan.to_ingest)} document(s) to ingest, "
+        f"{plan.unchanged} file(s) unchanged, {len(file_names) - len(plan.aliases)} duplicate(s), "
+        f"{len(plan.to_delete)} document(s) removed ({plan.hashed} file(s) hashed)."
+    )
+
+    if plan.to_delete:
+        with pooled_connection() as pg_conn:
+            shared = shared_doc_ids(pg_conn, source, plan.to_delete)
+        removed = [doc_id for doc_id in plan.to_delete if doc_id not in shared]
+        print(f"Deleted {delete_removed(removed)} removed document(s).")
+
+    file_paths = [os.path.join(pdfs_dir, file_name) for file_name in plan.to_ingest.values()]
+    doc_ids = {file_path: doc_id for doc_id, file_path in zip(plan.to_ingest, file_paths)}
+    content_hashes = {
+        os.path.join(pdfs_dir, file_name): plan.files[file_name]["sha256"] for file_name in plan.to_ingest.values()
+    }
+
+    if file_paths:
+        print("Loading sentence transformer model...")
+        model = get_model()
+        print(f"Full-text index: {ensure_fulltext_index(get_driver())}.")
+        print(f"Extracting with {workers} worker process(es).")
+
+    extraction_stage = Throughput("Extraction (worker time)")
+    embedding_stage = Throughput("Embedding")
+    write_stage = Throughput("Write (PostgreSQL + Neo4j)")
+    failures = []
 
-    processed_files = 0
-    for filename in os.listdir(pdfs_dir):
-        if filename.lower().endswith('.pdf'):
-            file_path = os.path.join(pdfs_dir, filename)
-            print(f"Processing '{filename}'...")
+    # Two batches in the queue let embedding run ahead of the writer without piling up memory
+    batches = queue.Queue(maxsize=2)
+
+    def writer():
+        while True:
+            records = batches.get()
+            if records is None:
+                return
             try:
-                with open(file_path, 'rb') as f:
-                    content = extract_text_from_pdf(f)
-                
-                doc_id = os.path.splitext(filename)[0]
-                result = add_document_to_db(doc_id, content, subject, model)
-                
-                if result.get("status") == "success":
-                    print(f"  -> Successfully ingested '{doc_id}'.")
-                    processed_files += 1
-                else:
-                    print(f"  -> Failed to ingest '{doc_id}': {result.get('message')}")
+                with write_stage.timed():
+                    write_stage.rows += write_batch(records)
+                write_stage.items += len(records)
             except Exception as e:
-                print(f"  -> An error occurred while processing {filename}: {e}")
+                failures.extend((record["id"], str(e)) for record in records)
+
+    writer_thread = threading.Thread(target=writer, name="ingest-writer")
+    writer_thread.start()
+
+    def flush(records):
+        try:
+            with embedding_stage.timed():
+                embedding_stage.items += embed_batch(records, model)
+        except Exception as e:
+            failures.extend((record["id"], str(e)) for record in records)
+            return
+        batches.put(records)
+        print(f"  -> Embedded {len(records)} document(s); {extraction_stage.items} of {len(file_paths)} extracted.")
+
+    start = time.perf_counter()
+    try:
+        pending = []
+        for file_path, pages, seconds, error in extract_all(file_paths, workers, content_hashes):
+            doc_id = doc_ids[file_path]
+            extraction_stage.seconds += seconds
+            if error is not None:
+                failures.append((doc_id, error))
+                continue
+            extraction_stage.items += 1
+            pending.append({"id": doc_id, "subject": subject, "collection": collection, "aliases": plan.aliases[doc_id],
+                            "content": join_pages(pages), "pages": pages})
+            if len(pending) >= batch_size:
+                flush(pending)
+                pending = []
+        if pending:
+            flush(pending)
+    finally:
+        batches.put(None)
+        writer_thread.join()
+
+    # Failed documents stay out of the manifest so the next run retries them
+    failed = {doc_id for doc_id, _ in failures}
+    with pooled_connection() as pg_conn:
+        save_manifest(pg_conn, source, {name: entry for name, entry in plan.files.items() if entry["doc_id"] not in failed})
+        if write_stage.items:
+            for index in create_collection_indexes(pg_conn, collection):
+                print(f"Vector index '{index}' is ready.")
+        if plan.to_delete or write_stage.items:
+            # Search results cached by running agents are stale now
+            bump_corpus_version(pg_conn)
+    close_pool()
+    close_driver()
+    elapsed = time.perf_counter() - start
 
-    print(f"\nIngestion finished. Processed {processed_files} PDF file(s).")
+    print(extraction_stage.report())
+    print(embedding_stage.report(unit="chunks"))
+    print(write_stage.report())
+    for doc_id, error in failures:
+        print(f"  -> Failed to ingest '{doc_id}': {error}")
+    rate = write_stage.items / elapsed if elapsed else 0.0
+    print(f"\nIngestion finished. Processed {write_stage.items} PDF file(s) in {elapsed:.2f}s ({rate:.1f} docs/sec).")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Ingest PDF documents from a directory.")
     parser.add_argument("--dir", default="data/pdfs", help="Directory for PDFs. Defaults to 'data/pdfs'.")
     parser.add_argument("--subject", required=True, help="Subject for the documents.")
+    parser.add_argument("--workers", type=int, default=None, help="Processes used for PDF text extraction. Defaults to the number of CPUs.")
+    parser.add_argument("--batch-size", type=int, default=16, help="Documents per embedding and write batch. Defaults to 16.")
+    parser.add_argument("--full", action="store_true", help="Re-ingest every file instead of only new and changed ones.")
+    parser.add_argument("--collection", required=True, help="Collection the documents go into: agentRH searches 'rh', agentSuporte 'suporte'. Changing it re-ingests the folder.")
     args = parser.parse_args()
-    main(args.dir, args.subject)
+    main(args.dir, args.subject, args.workers, args.batch_size, args.full, args.collection)
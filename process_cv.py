@@ -1,14 +1,22 @@
-import pdfplumber
+import argparse
+import os
 import json
 import re
+from dotenv import load_dotenv
+
+from rag_core.db_pool import close_pool
+from rag_core.extraction import iter_pdfplumber_pages, join_pages
+from rag_core.extraction_cache import cached_pages
+from rag_core.graph_loader import format_sync_stats, sync_graph
+from rag_core.neo4j_driver import close_driver, get_driver
+from rag_core.tool_cache import bump_corpus_version
+
+# Carrega as variáveis de ambiente (conexões com o Neo4j e o PostgreSQL)
+load_dotenv()
 
 def extract_text_from_pdf(pdf_path):
-    """Extrai texto de um arquivo PDF."""
-    with pdfplumber.open(pdf_path) as pdf:
-        full_text = ""
-        for page in pdf.pages:
-            full_text += page.extract_text() + "\n"
-    return full_text
+    """Extrai texto de um arquivo PDF, uma página por vez, usando o cache de extração."""
+    return join_pages(cached_pages(iter_pdfplumber_pages, pdf_path))
 
 def parse_cv_text(text):
     """Analisa o texto extraído do CV e o estrutura em um dicionário."""
@@ -86,10 +94,18 @@ def create_json_structure(cv_data):
         }
     }
 
-def main():
+def sync_cv_graph(json_data, source):
+    """Sincroniza o grafo do CV com o Neo4j, gravando apenas o que mudou."""
+    try:
+        print(format_sync_stats(sync_graph(get_driver(), json_data['graph'], source)))
+        # Resultados de busca em cache nos agentes em execução ficam desatualizados
+        bump_corpus_version()
+    finally:
+        close_driver()
+        close_pool()
+
+def main(pdf_path='data/CV.pdf', json_path='data/cv.json', sync=False):
     """Função principal para processar o CV e gerar o JSON."""
-    pdf_path = 'data/CV.pdf'
-    json_path = 'data/cv.json'
 
     print(f"Extraindo texto de {pdf_path}...")
     cv_text = extract_text_from_pdf(pdf_path)
@@ -104,7 +120,16 @@ def main():
     with open(json_path, 'w', encoding='utf-8') as f:
         json.dump(json_data, f, indent=2, ensure_ascii=False)
 
+    if sync:
+        print("Sincronizando o grafo com o Neo4j...")
+        sync_cv_graph(json_data, os.path.basename(json_path))
+
     print("Processo concluído com sucesso!")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Extrai um CV em PDF para JSON com documentos e grafo.")
+    parser.add_argument("--pdf", default="data/CV.pdf", help="CV em PDF. Padrão: 'data/CV.pdf'.")
+    parser.add_argument("--output", default="data/cv.json", help="Arquivo JSON gerado. Padrão: 'data/cv.json'.")
+    parser.add_argument("--sync-graph", action="store_true", help="Sincroniza o grafo gerado com o Neo4j.")
+    args = parser.parse_args()
+    main(args.pdf, args.output, args.sync_graph)
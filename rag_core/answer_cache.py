@@ -0,0 +1,246 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+import numpy as np
+
+from rag_core.embedding_cache import cached_query_embedding
+from rag_core.embeddings import get_model
+from rag_core.tool_cache import current_corpus_version
+
+# High on purpose: a wrong cached answer costs more than a call to the model.
+DEFAULT_THRESHOLD = 0.95
+# Tools whose results are the documents an answer is based on
+SEARCH_TOOLS = ("contextsearch", "vectorsearch")
+# Tools that only read; any other tool call keeps the answer out of the cache
+READ_ONLY_TOOLS = SEARCH_TOOLS + ("graphsearch",)
+
+
+class SemanticAnswerCache:
+    """Thread-safe LRU cache of agent answers looked up by question similarity.
+
+    Entries are scoped by (agent, corpus version): a question only matches
+    questions asked to the same agent while the corpus was unchanged, when
+    the cosine similarity of their embeddings is at least ``threshold``. Each
+    entry remembers the documents its answer cited so it can be dropped when
+    one of them changes. Entries older than ``ttl`` seconds are misses and
+    at most ``max_entries`` are kept.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, ttl: float = 3600.0, max_entries: int = 1000):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl > 0 and time.time() - created > self.ttl
+
+    def lookup(self, scope: tuple, embedding: np.ndarray) -> Optional[dict]:
+        """Returns the best entry of ``scope`` above the threshold, or None."""
+        with self._lock:
+            best_key, best_score = None, self.threshold
+            for key, entry in list(self._entries.items()):
+                if self._expired(entry["created"]):
+                    del self._entries[key]
+                    continue
+                if entry["scope"] != scope:
+                    continue
+                score = float(np.dot(entry["embedding"], embedding))
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self._hits += 1
+            entry = self._entries[best_key]
+            return {"question": entry["question"], "answer": entry["answer"],
+                    "doc_ids": sorted(entry["doc_ids"]), "similarity": round(best_score, 4)}
+
+    def put(self, scope: tuple, question: str, embedding: np.ndarray, answer: str, doc_ids: Iterable[str]):
+        with self._lock:
+            self._entries[self._next_key] = {
+                "scope": scope, "question": question, "embedding": embedding,
+                "answer": answer, "doc_ids": frozenset(doc_ids), "created": time.time(),
+            }
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate_documents(self, doc_ids: Iterable[str]) -> int:
+        """Drops every answer that cited one of ``doc_ids``; returns how many were dropped."""
+        doc_ids = set(doc_ids)
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry["doc_ids"] & doc_ids]
+            for key in stale:
+                del self._entries[key]
+            self._invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "threshold": self.threshold,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# --- Process-wide cache --- #
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    """Returns the process-wide answer cache, creating it on first use.
+
+    Configured with ANSWER_CACHE_ENABLED (default on), ANSWER_CACHE_THRESHOLD
+    (cosine similarity, default 0.95), ANSWER_CACHE_TTL (seconds, default
+    3600; 0 disables expiry) and ANSWER_CACHE_SIZE (entries, default 1000).
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if os.environ.get("ANSWER_CACHE_ENABLED", "true").lower() not in ("1", "true", "yes"):
+                    return None
+                _cache = SemanticAnswerCache(
+                    threshold=float(os.environ.get("ANSWER_CACHE_THRESHOLD", str(DEFAULT_THRESHOLD))),
+                    ttl=float(os.environ.get("ANSWER_CACHE_TTL", "3600")),
+                    max_entries=int(os.environ.get("ANSWER_CACHE_SIZE", "1000")),
+                )
+    return _cache
+
+
+def invalidate_documents(doc_ids: Iterable[str]) -> int:
+    """Drops cached answers citing ``doc_ids``; a no-op until the cache exists."""
+    if _cache is None:
+        return 0
+    return _cache.invalidate_documents(doc_ids)
+
+
+def get_answer_cache_stats() -> dict:
+    if _cache is None:
+        return {"initialized": False}
+    return {"initialized": True, **_cache.stats()}
+
+
+# --- ADK agent callbacks --- #
+
+# Questions being answered, by invocation id, until their final response is stored
+_pending = OrderedDict()
+_pending_lock = threading.Lock()
+_MAX_PENDING = 1024
+
+
+def _text(content) -> str:
+    if content is None or not content.parts:
+        return ""
+    return "".join(part.text for part in content.parts if getattr(part, "text", None))
+
+
+def _is_first_turn(callback_context) -> bool:
+    # Follow-up questions depend on the conversation so far and are never cached
+    turns = [event for event in callback_context.session.events if event.author == "user" and _text(event.content)]
+    return len(turns) <= 1
+
+
+def _cited_doc_ids(tool_response) -> set:
+    if isinstance(tool_response, dict):
+        tool_response = tool_response.get("documents", tool_response.get("result"))
+    if not isinstance(tool_response, list):
+        return set()
+    return {doc["id"] for doc in tool_response if isinstance(doc, dict) and "id" in doc}
+
+
+def answer_cache_callbacks() -> dict:
+    """Callbacks that put the process-wide answer cache in front of an ADK agent.
+
+    Use as ``Agent(..., **answer_cache_callbacks())``. The first question of
+    a session is embedded with the search model and looked up in the scope
+    of the agent and the current corpus version; a hit is returned as the
+    agent's reply without calling the model. Otherwise the documents returned
+    by the search tools are collected and the final answer is stored with
+    them, unless it cited none or a tool outside ``READ_ONLY_TOOLS`` ran.
+    """
+    from google.genai import types
+
+    def before_agent_callback(callback_context):
+        cache = get_answer_cache()
+        question = _text(callback_context.user_content)
+        if cache is None or not question.strip() or not _is_first_turn(callback_context):
+            return None
+        try:
+            version = current_corpus_version()
+        except Exception:
+            # Without a version a cached answer could be stale
+            return None
+        embedding = np.asarray(cached_query_embedding(get_model(), question), dtype=np.float32)
+        embedding = embedding / (np.linalg.norm(embedding) or 1.0)
+        scope = (callback_context.agent_name, version)
+        hit = cache.lookup(scope, embedding)
+        if hit is not None:
+            return types.Content(role="model", parts=[types.Part(text=hit["answer"])])
+        with _pending_lock:
+            _pending[callback_context.invocation_id] = {
+                "scope": scope, "question": question, "embedding": embedding, "doc_ids": set(),
+                "cacheable": True,
+            }
+            while len(_pending) > _MAX_PENDING:
+                _pending.popitem(last=False)
+        return None
+
+    def after_tool_callback(tool, args, tool_context, tool_response):
+        with _pending_lock:
+            pending = _pending.get(tool_context.invocation_id)
+            if pending is None:
+                return None
+            if tool.name not in READ_ONLY_TOOLS:
+                # The answer reports an action, such as a message sent, not what the documents say
+                pending["cacheable"] = False
+            elif tool.name in SEARCH_TOOLS:
+                pending["doc_ids"] |= _cited_doc_ids(tool_response)
+        return None
+
+    def after_model_callback(callback_context, llm_response):
+        content = llm_response.content
+        if llm_response.partial or content is None or not content.parts:
+            return None
+        if any(getattr(part, "function_call", None) for part in content.parts):
+            return None
+        with _pending_lock:
+            pending = _pending.pop(callback_context.invocation_id, None)
+        cache = get_answer_cache()
+        answer = _text(content)
+        if (pending is not None and cache is not None and pending["cacheable"]
+                and pending["doc_ids"] and answer.strip()):
+            cache.put(pending["scope"], pending["question"], pending["embedding"], answer, pending["doc_ids"])
+        return None
+
+    return {
+        "before_agent_callback": before_agent_callback,
+        "after_tool_callback": after_tool_callback,
+        "after_model_callback": after_model_callback,
+    }
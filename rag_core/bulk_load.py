@@ -0,0 +1,193 @@
+import struct
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+import numpy as np
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+from rag_core.chunk_store import DEFAULT_COLLECTION, check_collection, document_embedding
+
+LOAD_METHODS = ("copy", "values")
+
+_DOCUMENT_COLUMNS = ("id", "subject", "content", "embedding", "collection")
+_DOCUMENT_KINDS = ("text", "text", "text", "vector", "text")
+_CHUNK_COLUMNS = ("doc_id", "chunk_index", "page", "heading", "content", "embedding", "collection")
+_CHUNK_KINDS = ("text", "int4", "int4", "text", "text", "vector", "text")
+
+_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+_COPY_TRAILER = struct.pack("!h", -1)
+
+
+# --- Embedding --- #
+
+def encode_in_batches(model, texts: list[str], batch_size: int = 64) -> np.ndarray:
+    """Encodes texts in batches of similar length to minimize padding.
+
+    The texts are sorted by length so each batch pads to a similar size, and
+    the embeddings are returned in the original order.
+    """
+    if not texts:
+        return np.empty((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    embeddings = np.empty((len(texts), model.get_sentence_embedding_dimension()), dtype=np.float32)
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        embeddings[batch] = model.encode([texts[i] for i in batch], batch_size=batch_size)
+    return embeddings
+
+
+def embed_in_batches(model, chunks: Iterable[dict], batch_size: int = 64) -> Iterator[tuple[list[dict], np.ndarray]]:
+    """Groups a chunk stream into batches and encodes each batch as soon as it fills."""
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            yield batch, model.encode([c["content"] for c in batch], batch_size=batch_size)
+            batch = []
+    if batch:
+        yield batch, model.encode([c["content"] for c in batch], batch_size=batch_size)
+
+
+# --- Binary COPY --- #
+
+def _encode_field(value, kind: str) -> bytes:
+    if value is None:
+        return struct.pack("!i", -1)
+    if kind == "text":
+        data = value.encode("utf-8")
+    elif kind == "int4":
+        data = struct.pack("!i", value)
+    elif kind == "vector":
+        # pgvector binary format: int16 dimensions, int16 unused, float4 values (big-endian)
+        values = np.asarray(value, dtype=">f4")
+        data = struct.pack("!hh", len(values), 0) + values.tobytes()
+    else:
+        raise ValueError(f"Unsupported COPY field kind '{kind}'")
+    return struct.pack("!i", len(data)) + data
+
+
+class _BinaryCopyStream:
+    """File-like object that renders rows in PGCOPY binary format on demand."""
+
+    def __init__(self, rows, kinds):
+        self._rows = iter(rows)
+        self._kinds = kinds
+        self._buffer = bytearray(_COPY_HEADER)
+        self._done = False
+
+    def _fill(self, size: int):
+        while not self._done and len(self._buffer) < size:
+            row = next(self._rows, None)
+            if row is None:
+                self._buffer += _COPY_TRAILER
+                self._done = True
+                break
+            self._buffer += struct.pack("!h", len(self._kinds))
+            for value, kind in zip(row, self._kinds):
+                self._buffer += _encode_field(value, kind)
+
+    def read(self, size: int = -1) -> bytes:
+        unbounded = size is None or size < 0
+        self._fill(float("inf") if unbounded else size)
+        if unbounded:
+            size = len(self._buffer)
+        chunk = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return chunk
+
+
+def copy_rows(cur, table: str, columns, kinds, rows):
+    """Streams rows into ``table`` with COPY ... FROM STDIN (FORMAT binary)."""
+    statement = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT binary)").format(
+        sql.Identifier(table), sql.SQL(", ").join(map(sql.Identifier, columns))
+    )
+    cur.copy_expert(statement.as_string(cur), _BinaryCopyStream(rows, kinds))
+
+
+# --- Writers --- #
+
+def _collection(record) -> str:
+    return check_collection(record.get("collection", DEFAULT_COLLECTION))
+
+
+def _document_rows(records):
+    for record in records:
+        yield (record["id"], record["subject"], record["content"], document_embedding(record["embeddings"]),
+               _collection(record))
+
+
+def _chunk_rows(records):
+    for record in records:
+        collection = _collection(record)
+        for chunk, embedding in zip(record["chunks"], record["embeddings"]):
+            yield (record["id"], chunk["chunk_index"], chunk.get("page"), chunk.get("heading"), chunk["content"], embedding,
+                   collection)
+
+
+def write_documents(conn, records: list[dict], method: str = "copy") -> int:
+    """Upserts documents and replaces their chunks in bulk, returning the rows written.
+
+    Each record holds 'id', 'subject', 'content', 'chunks' and the chunk
+    'embeddings', plus an optional 'collection' (DEFAULT_COLLECTION). With ``method='copy'`` documents go through a temporary
+    staging table (COPY cannot upsert) and chunks are copied straight into
+    document_chunks; ``method='values'`` uses multi-row INSERTs instead.
+    """
+    if method not in LOAD_METHODS:
+        raise ValueError(f"Unknown load method '{method}'. Supported methods are {list(LOAD_METHODS)}")
+    if not records:
+        return 0
+
+    upsert = (
+        "INSERT INTO documents (id, subject, content, embedding, collection) {source} "
+        "ON CONFLICT (id) DO UPDATE SET subject = EXCLUDED.subject, content = EXCLUDED.content, embedding = EXCLUDED.embedding, "
+        "collection = EXCLUDED.collection;"
+    )
+    with conn.cursor() as cur:
+        if method == "copy":
+            cur.execute("CREATE TEMP TABLE IF NOT EXISTS documents_staging (LIKE documents) ON COMMIT DROP;")
+            cur.execute("TRUNCATE documents_staging;")
+            copy_rows(cur, "documents_staging", _DOCUMENT_COLUMNS, _DOCUMENT_KINDS, _document_rows(records))
+            cur.execute(upsert.format(source="SELECT id, subject, content, embedding, collection FROM documents_staging"))
+        else:
+            execute_values(cur, upsert.format(source="VALUES %s"), list(_document_rows(records)), page_size=500)
+
+        cur.execute("DELETE FROM document_chunks WHERE doc_id = ANY(%s);", ([record["id"] for record in records],))
+        if method == "copy":
+            copy_rows(cur, "document_chunks", _CHUNK_COLUMNS, _CHUNK_KINDS, _chunk_rows(records))
+        else:
+            execute_values(
+                cur,
+                "INSERT INTO document_chunks (doc_id, chunk_index, page, heading, content, embedding, collection) VALUES %s",
+                list(_chunk_rows(records)),
+                page_size=500
+            )
+
+    return len(records) + sum(len(record["chunks"]) for record in records)
+
+
+class Throughput:
+    """Tracks items processed by a stage and reports items per second."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.rows = 0
+        self.seconds = 0.0
+
+    @contextmanager
+    def timed(self):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.seconds += time.perf_counter() - start
+
+    def report(self, unit: str = "docs") -> str:
+        rate = self.items / self.seconds if self.seconds else 0.0
+        line = f"{self.name}: {self.items} {unit} in {self.seconds:.2f}s ({rate:.1f} {unit}/sec)"
+        if self.rows:
+            line += f", {self.rows} rows ({self.rows / self.seconds if self.seconds else 0.0:.1f} rows/sec)"
+        return line
+
@@ -0,0 +1,410 @@
+import os
+import re
+import uuid
+from typing import Optional
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+EMBEDDING_DIMENSIONS = 384
+TEXT_SEARCH_CONFIG = "portuguese"
+# Reciprocal rank fusion smoothing constant from Cormack et al.
+RRF_K = 60
+
+# Documents belong to one collection; each agent searches only its own. The
+# name becomes part of index names, so it is restricted to a safe identifier
+# short enough for the longest one, document_chunks_embedding_half_ivfflat_<name>_idx,
+# to fit in PostgreSQL's 63-character identifiers.
+# The default is the one agentSuporte, which serves the upload API, searches.
+DEFAULT_COLLECTION = "suporte"
+# Documents stored before collections existed, the HR PDFs and CV of the
+# original corpus, go to agentRH's collection (EXISTING_DOCUMENTS_COLLECTION).
+EXISTING_DOCUMENTS_COLLECTION = "rh"
+_COLLECTION_NAME = re.compile(r"[a-z][a-z0-9_]{0,19}")
+
+# Representation searched by the first (coarse) pass over chunk embeddings.
+# The compact ones are generated columns next to the full float32 vectors,
+# which are kept for the exact rescore: halfvec (float16) halves the index,
+# bit (one sign bit per dimension, compared by Hamming distance) makes it 32x smaller.
+STORAGE_MODES = ("vector", "halfvec", "bit")
+STORAGE_COLUMNS = {
+    "vector": "embedding",
+    "halfvec": "embedding_half",
+    "bit": "embedding_bit",
+}
+_STORAGE_EXPRESSIONS = {
+    "halfvec": (f"halfvec({EMBEDDING_DIMENSIONS})", f"embedding::halfvec({EMBEDDING_DIMENSIONS})"),
+    "bit": (f"bit({EMBEDDING_DIMENSIONS})", f"binary_quantize(embedding)::bit({EMBEDDING_DIMENSIONS})"),
+}
+_COARSE_DISTANCES = {
+    "halfvec": f"c.embedding_half <=> %(embedding)s::halfvec({EMBEDDING_DIMENSIONS})",
+    "bit": f"c.embedding_bit <~> binary_quantize(%(embedding)s::vector)::bit({EMBEDDING_DIMENSIONS})",
+}
+# Coarse candidates fetched per returned row; binary codes lose more ranking detail than float16
+DEFAULT_RESCORE_FACTORS = {"vector": 1, "halfvec": 2, "bit": 8}
+
+
+def ensure_schema(conn):
+    """Creates the documents table and its chunk table if they do not exist."""
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, subject TEXT, content TEXT, embedding VECTOR({EMBEDDING_DIMENSIONS}));")
+        cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS document_chunks (
+                doc_id TEXT NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+                chunk_index INTEGER NOT NULL,
+                page INTEGER,
+                heading TEXT,
+                content TEXT NOT NULL,
+                embedding VECTOR({EMBEDDING_DIMENSIONS}),
+                PRIMARY KEY (doc_id, chunk_index)
+            );
+            """
+        )
+        # Lexical side of hybrid search: kept up to date by Postgres itself
+        cur.execute(
+            f"ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS content_tsv tsvector "
+            f"GENERATED ALWAYS AS (to_tsvector('{TEXT_SEARCH_CONFIG}', content)) STORED;"
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS document_chunks_content_tsv_idx ON document_chunks USING gin (content_tsv);")
+        # Copied onto the chunks so searches filter the chunk table, and its per-collection indexes, directly
+        existing = check_collection(os.environ.get("EXISTING_DOCUMENTS_COLLECTION", EXISTING_DOCUMENTS_COLLECTION))
+        for table in ("documents", "document_chunks"):
+            cur.execute(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND table_name = %s AND column_name = 'collection';",
+                (table,)
+            )
+            if cur.fetchone() is None:
+                # Only when the column is added: the rows already there get their collection, new rows the default
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN collection TEXT NOT NULL DEFAULT '{existing}';")
+                cur.execute(f"ALTER TABLE {table} ALTER COLUMN collection SET DEFAULT '{DEFAULT_COLLECTION}';")
+        cur.execute("CREATE INDEX IF NOT EXISTS documents_collection_idx ON documents (collection);")
+    ensure_storage_column(conn, vector_storage())
+
+
+def check_collection(collection: str) -> str:
+    """Returns ``collection`` if it is a valid collection name, raising ValueError otherwise."""
+    if not isinstance(collection, str) or not _COLLECTION_NAME.fullmatch(collection):
+        raise ValueError(
+            f"Invalid collection '{collection}': use up to 20 lowercase letters, digits and underscores, starting with a letter"
+        )
+    return collection
+
+
+def vector_storage() -> str:
+    """Representation searched by the coarse pass (VECTOR_STORAGE, default 'vector': no rescore)."""
+    storage = os.environ.get("VECTOR_STORAGE", "vector")
+    if storage not in STORAGE_MODES:
+        raise ValueError(f"Unknown vector storage '{storage}'. Supported modes are {list(STORAGE_MODES)}")
+    return storage
+
+
+def rescore_factor(storage: str) -> int:
+    """Coarse candidates per returned row (RESCORE_FACTOR, default per storage mode)."""
+    factor = os.environ.get("RESCORE_FACTOR")
+    return int(factor) if factor and storage != "vector" else DEFAULT_RESCORE_FACTORS[storage]
+
+
+def ensure_storage_column(conn, storage: str):
+    """Adds the generated chunk column of a compact storage mode if it does not exist.
+
+    Postgres computes it from the full vector on every write, so no writer
+    has to know which modes are enabled. Adding it rewrites the table once.
+    """
+    if storage == "vector":
+        return
+    column_type, expression = _STORAGE_EXPRESSIONS[storage]
+    with conn.cursor() as cur:
+        cur.execute(
+            f"ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS {STORAGE_COLUMNS[storage]} {column_type} "
+            f"GENERATED ALWAYS AS ({expression}) STORED;"
+        )
+
+
+def _normalized(vector: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def document_embedding(chunk_embeddings) -> Optional[np.ndarray]:
+    """Represents the whole document by the normalized mean of its chunk embeddings."""
+    if chunk_embeddings is None or len(chunk_embeddings) == 0:
+        return None
+    return _normalized(np.mean(np.asarray(chunk_embeddings, dtype=np.float32), axis=0))
+
+
+def store_document(conn, doc_id: str, subject: str, content: str, chunks: list[dict], chunk_embeddings,
+                   collection: str = DEFAULT_COLLECTION):
+    """Upserts a parent document in ``collection`` and replaces all of its chunks."""
+    check_collection(collection)
+    with conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO documents (id, subject, content, embedding, collection) VALUES (%s, %s, %s, %s, %s) ON CONFLICT (id) DO UPDATE SET subject = EXCLUDED.subject, content = EXCLUDED.content, embedding = EXCLUDED.embedding, collection = EXCLUDED.collection;",
+            (doc_id, subject, content, document_embedding(chunk_embeddings), collection)
+        )
+        cur.execute("DELETE FROM document_chunks WHERE doc_id = %s;", (doc_id,))
+        if chunks:
+            execute_values(
+                cur,
+                "INSERT INTO document_chunks (doc_id, chunk_index, page, heading, content, embedding, collection) VALUES %s",
+                [
+                    (doc_id, chunk["chunk_index"], chunk.get("page"), chunk.get("heading"), chunk["content"], embedding, collection)
+                    for chunk, embedding in zip(chunks, chunk_embeddings)
+                ]
+            )
+
+
+def ensure_chunk_staging(conn):
+    """Creates the table chunks are staged in until their document is swapped in.
+
+    It is unlogged and unindexed: its rows only live for one ingestion.
+    Rows older than a day, left by a process that died mid-ingestion, are
+    removed.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            CREATE UNLOGGED TABLE IF NOT EXISTS document_chunks_staging (
+                ingest_id TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                page INTEGER,
+                heading TEXT,
+                content TEXT NOT NULL,
+                embedding VECTOR({EMBEDDING_DIMENSIONS}),
+                staged_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+            """
+        )
+        cur.execute("DELETE FROM document_chunks_staging WHERE staged_at < now() - interval '1 day';")
+
+
+def stage_chunks(conn, ingest_id: str, chunks: list[dict], embeddings):
+    with conn.cursor() as cur:
+        execute_values(
+            cur,
+            "INSERT INTO document_chunks_staging (ingest_id, chunk_index, page, heading, content, embedding) VALUES %s",
+            [
+                (ingest_id, chunk["chunk_index"], chunk.get("page"), chunk.get("heading"), chunk["content"], embedding)
+                for chunk, embedding in zip(chunks, embeddings)
+            ]
+        )
+
+
+def swap_in_staged_chunks(conn, ingest_id: str, doc_id: str, subject: str, content: str, embedding,
+                          collection: str = DEFAULT_COLLECTION) -> int:
+    """Upserts the document and replaces its chunks with the staged ones; returns the chunks written."""
+    with conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO documents (id, subject, content, embedding, collection) VALUES (%s, %s, %s, %s, %s) ON CONFLICT (id) DO UPDATE SET subject = EXCLUDED.subject, content = EXCLUDED.content, embedding = EXCLUDED.embedding, collection = EXCLUDED.collection;",
+            (doc_id, subject, content, embedding, collection)
+        )
+        cur.execute("DELETE FROM document_chunks WHERE doc_id = %s;", (doc_id,))
+        cur.execute(
+            "INSERT INTO document_chunks (doc_id, chunk_index, page, heading, content, embedding, collection) "
+            "SELECT %s, chunk_index, page, heading, content, embedding, %s FROM document_chunks_staging WHERE ingest_id = %s;",
+            (doc_id, collection, ingest_id)
+        )
+        written = cur.rowcount
+        cur.execute("DELETE FROM document_chunks_staging WHERE ingest_id = %s;", (ingest_id,))
+    return written
+
+
+def discard_staged_chunks(conn, ingest_id: str):
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM document_chunks_staging WHERE ingest_id = %s;", (ingest_id,))
+
+
+def store_document_stream(connect, doc_id: str, subject: str, batches, content,
+                          collection: str = DEFAULT_COLLECTION) -> int:
+    """Upserts a document of ``collection`` whose chunks arrive as (chunks, embeddings) batches.
+
+    ``connect`` returns a connection context, such as
+    ``db_pool.pooled_connection``, and is entered once per short transaction.
+    No connection is held while ``batches`` extracts and embeds the next
+    batch. Each batch is staged as it arrives, so only one is held in memory,
+    and the document, its text from ``content()``, its embedding from the
+    running chunk sum and the staged chunks are swapped in by one final
+    transaction. Searches see the previous version until then. Returns the
+    number of chunks written.
+    """
+    check_collection(collection)
+    ingest_id = uuid.uuid4().hex
+    with connect() as conn:
+        ensure_chunk_staging(conn)
+    total = None
+    try:
+        for chunks, embeddings in batches:
+            if not chunks:
+                continue
+            with connect() as conn:
+                stage_chunks(conn, ingest_id, chunks, embeddings)
+            batch_total = np.sum(np.asarray(embeddings, dtype=np.float32), axis=0)
+            total = batch_total if total is None else total + batch_total
+        with connect() as conn:
+            return swap_in_staged_chunks(conn, ingest_id, doc_id, subject, content(),
+                                         _normalized(total) if total is not None else None, collection)
+    except BaseException:
+        with connect() as conn:
+            discard_staged_chunks(conn, ingest_id)
+        raise
+
+
+def delete_documents(conn, doc_ids: list[str]) -> int:
+    """Deletes documents and, through the cascade, their chunks. Returns the documents deleted."""
+    if not doc_ids:
+        return 0
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM documents WHERE id = ANY(%s);", (list(doc_ids),))
+        return cur.rowcount
+
+
+def _chunk_filters(subject: Optional[str], collection: Optional[str]) -> tuple[str, list[str]]:
+    """Join and conditions restricting chunks ``c`` to a subject and/or collection.
+
+    The collection is matched on the chunk row itself, so the planner can
+    use that collection's partial ANN index and never visits other rows.
+    """
+    conditions = []
+    if collection:
+        conditions.append("c.collection = %(collection)s")
+    if subject:
+        conditions.append("d.subject = %(subject)s")
+    return (" JOIN documents d ON d.id = c.doc_id" if subject else ""), conditions
+
+
+def _nearest_chunks_sql(storage: str, chunk_filter: str) -> str:
+    """SQL for the (doc_id, chunk_index, distance) of the %(limit)s nearest chunks, nearest first.
+
+    With a compact storage mode the ANN index on that column picks
+    %(candidates)s chunks, which are then reordered by the exact distance
+    to the full vectors.
+    """
+    if storage == "vector":
+        # Ordering by the distance expression lets the planner use the chunk ANN index
+        return (
+            f"SELECT c.doc_id, c.chunk_index, c.embedding <=> %(embedding)s AS distance "
+            f"FROM document_chunks c{chunk_filter} "
+            f"ORDER BY c.embedding <=> %(embedding)s LIMIT %(limit)s"
+        )
+    return (
+        f"SELECT c.doc_id, c.chunk_index, c.embedding <=> %(embedding)s AS distance FROM ("
+        f"SELECT c.doc_id, c.chunk_index, c.embedding FROM document_chunks c{chunk_filter} "
+        f"ORDER BY {_COARSE_DISTANCES[storage]} LIMIT %(candidates)s"
+        f") c ORDER BY distance LIMIT %(limit)s"
+    )
+
+
+def search_chunks(cur, query_embedding, subject: Optional[str] = None, limit: int = 20,
+                  storage: str = "vector", candidates: Optional[int] = None,
+                  collection: Optional[str] = None) -> list[tuple]:
+    """Returns the ``limit`` nearest chunks as (doc_id, subject, chunk_index, page, content, score) rows.
+
+    ``storage`` picks the representation of the first pass (see
+    STORAGE_MODES); ``candidates`` coarse hits, by default ``limit`` times
+    the storage mode's rescore factor, are rescored against the full vectors.
+    With ``collection`` only that collection's chunks are searched.
+    """
+    join, conditions = _chunk_filters(subject, collection)
+    chunk_filter = join + (" WHERE " + " AND ".join(conditions) if conditions else "")
+    query = f"""
+        WITH nearest AS ({_nearest_chunks_sql(storage, chunk_filter)})
+        SELECT c.doc_id, d.subject, c.chunk_index, c.page, c.content, 1 - n.distance AS similarity_score
+        FROM nearest n
+        JOIN document_chunks c ON c.doc_id = n.doc_id AND c.chunk_index = n.chunk_index
+        JOIN documents d ON d.id = c.doc_id
+        ORDER BY n.distance
+    """
+    cur.execute(query, {
+        "embedding": query_embedding,
+        "subject": subject,
+        "collection": collection,
+        "limit": limit,
+        "candidates": candidates or limit * rescore_factor(storage),
+    })
+    return cur.fetchall()
+
+
+def hybrid_search_chunks(cur, query_text: str, query_embedding, subject: Optional[str] = None, limit: int = 20,
+                         semantic_weight: float = 1.0, lexical_weight: float = 1.0, rrf_k: int = RRF_K,
+                         storage: str = "vector", candidates: Optional[int] = None,
+                         collection: Optional[str] = None) -> list[tuple]:
+    """Fuses ANN and full-text chunk rankings with reciprocal rank fusion in one query.
+
+    Each side contributes ``weight / (rrf_k + rank)`` for the chunks it
+    returns among its top ``limit``. The semantic side is ranked as in
+    ``search_chunks``, including the exact rescore of compact storage modes.
+    Rows have the same shape as ``search_chunks`` with the fused score in
+    the last column.
+    """
+    join, conditions = _chunk_filters(subject, collection)
+    chunk_filter = join + (" WHERE " + " AND ".join(conditions) if conditions else "")
+    lexical_filter = "".join(" AND " + condition for condition in conditions)
+    query = f"""
+        WITH nearest AS ({_nearest_chunks_sql(storage, chunk_filter)}),
+        semantic AS (
+            SELECT doc_id, chunk_index, RANK() OVER (ORDER BY distance) AS rank FROM nearest
+        ),
+        lexical AS (
+            SELECT c.doc_id, c.chunk_index, RANK() OVER (ORDER BY ts_rank_cd(c.content_tsv, q) DESC) AS rank
+            FROM document_chunks c{join}, websearch_to_tsquery('{TEXT_SEARCH_CONFIG}', %(text)s) q
+            WHERE c.content_tsv @@ q{lexical_filter}
+            ORDER BY ts_rank_cd(c.content_tsv, q) DESC
+            LIMIT %(limit)s
+        ),
+        fused AS (
+            SELECT coalesce(s.doc_id, l.doc_id) AS doc_id,
+                   coalesce(s.chunk_index, l.chunk_index) AS chunk_index,
+                   coalesce(%(semantic_weight)s / (%(rrf_k)s + s.rank), 0.0)
+                   + coalesce(%(lexical_weight)s / (%(rrf_k)s + l.rank), 0.0) AS score
+            FROM semantic s
+            FULL OUTER JOIN lexical l ON l.doc_id = s.doc_id AND l.chunk_index = s.chunk_index
+        )
+        SELECT c.doc_id, d.subject, c.chunk_index, c.page, c.content, f.score
+        FROM fused f
+        JOIN document_chunks c ON c.doc_id = f.doc_id AND c.chunk_index = f.chunk_index
+        JOIN documents d ON d.id = c.doc_id
+        ORDER BY f.score DESC
+        LIMIT %(limit)s
+    """
+    cur.execute(query, {
+        "embedding": query_embedding,
+        "text": query_text,
+        "subject": subject,
+        "collection": collection,
+        "limit": limit,
+        "semantic_weight": float(semantic_weight),
+        "lexical_weight": float(lexical_weight),
+        "rrf_k": rrf_k,
+        "candidates": candidates or limit * rescore_factor(storage),
+    })
+    return cur.fetchall()
+
+
+def aggregate_by_document(rows: list[tuple], limit: int, passages_per_doc: int = 3,
+                          score_key: str = "similarity_score") -> list[dict]:
+    """Groups chunk hits by parent document, best document first.
+
+    A document scores as its best chunk. Its 'content' is made of its best
+    ``passages_per_doc`` chunks in reading order, so callers get the matching
+    passages instead of the whole document.
+    """
+    documents = {}
+    for doc_id, subject, chunk_index, page, content, score in rows:
+        doc = documents.get(doc_id)
+        if doc is None:
+            if len(documents) >= limit:
+                continue
+            doc = documents[doc_id] = {"id": doc_id, "subject": subject, score_key: score, "passages": []}
+        if len(doc["passages"]) < passages_per_doc:
+            doc["passages"].append({"chunk_index": chunk_index, "page": page, "content": content,
+                                    score_key: round(score, 4)})
+
+    results = []
+    for doc in documents.values():
+        passages = sorted(doc.pop("passages"), key=lambda p: p["chunk_index"])
+        doc["content"] = "\n...\n".join(p["content"] for p in passages)
+        doc[score_key] = round(doc[score_key], 4)
+        doc["passages"] = [{k: v for k, v in p.items() if k != "content"} for p in passages]
+        results.append(doc)
+    return results
@@ -0,0 +1,171 @@
+import math
+import os
+import re
+from typing import Callable, Iterable, Iterator, Optional
+
+# all-MiniLM-L6-v2 truncates at 256 word pieces (including special tokens),
+# so chunks stay comfortably below that by default.
+DEFAULT_MAX_TOKENS = 200
+DEFAULT_OVERLAP = 40
+
+TokenCounter = Callable[[list[str]], list[int]]
+
+_MARKDOWN_HEADING = re.compile(r"^\s{0,3}#{1,6}\s+\S")
+_NUMBERED_HEADING = re.compile(r"^\d+(\.\d+)*\.?\s+[A-ZÀ-Ú]")
+
+
+def estimate_token_counts(words: list[str]) -> list[int]:
+    """Rough WordPiece estimate used when no tokenizer is available."""
+    return [max(1, math.ceil(len(word) / 5)) for word in words]
+
+
+def tokenizer_token_counter(tokenizer) -> TokenCounter:
+    """Builds a per-word token counter from a Hugging Face tokenizer."""
+    def count(words: list[str]) -> list[int]:
+        if not words:
+            return []
+        encoded = tokenizer(words, add_special_tokens=False)["input_ids"]
+        return [max(1, len(ids)) for ids in encoded]
+    return count
+
+
+def is_heading(line: str) -> bool:
+    """Detects Markdown, numbered ("2.1 Escopo") and all-caps section titles."""
+    stripped = line.strip()
+    if not stripped or len(stripped) > 80:
+        return False
+    if _MARKDOWN_HEADING.match(line):
+        return True
+    if stripped.endswith((".", ",", ";", ":")):
+        return False
+    if _NUMBERED_HEADING.match(stripped):
+        return True
+    letters = [c for c in stripped if c.isalpha()]
+    return len(letters) >= 4 and all(c.isupper() for c in letters)
+
+
+def split_sections(text: str) -> list[tuple[Optional[str], str]]:
+    """Splits text into (heading, body) sections. The heading line stays in the body."""
+    sections = []
+    heading, lines = None, []
+    for line in text.splitlines():
+        if is_heading(line) and any(l.strip() for l in lines):
+            sections.append((heading, "\n".join(lines)))
+            lines = []
+        if is_heading(line):
+            heading = line.strip().lstrip("#").strip()
+        lines.append(line)
+    if any(l.strip() for l in lines):
+        sections.append((heading, "\n".join(lines)))
+    return sections
+
+
+def sliding_windows(counts: list[int], max_tokens: int, overlap: int) -> Iterable[tuple[int, int]]:
+    """Yields (start, end) word ranges holding at most ``max_tokens`` tokens.
+
+    Consecutive windows share roughly ``overlap`` tokens. A single word longer
+    than ``max_tokens`` still gets its own window so progress is guaranteed.
+    """
+    start, n = 0, len(counts)
+    while start < n:
+        total, end = 0, start
+        while end < n and (end == start or total + counts[end] <= max_tokens):
+            total += counts[end]
+            end += 1
+        yield start, end
+        if end >= n:
+            break
+        new_start, shared = end, 0
+        while new_start > start + 1 and shared + counts[new_start - 1] <= overlap:
+            new_start -= 1
+            shared += counts[new_start]
+        start = new_start
+
+
+def chunk_text(text: str, max_tokens: int = DEFAULT_MAX_TOKENS, overlap: int = DEFAULT_OVERLAP,
+               count_tokens: Optional[TokenCounter] = None, heading_aware: bool = True,
+               page: Optional[int] = None) -> list[dict]:
+    """Splits text into token-bounded chunks.
+
+    With ``heading_aware`` the text is first cut at section titles; small
+    consecutive sections are packed together and long ones are split with an
+    overlapping sliding window. Each chunk is a dict with 'content', 'page',
+    'heading' and 'token_count'.
+    """
+    count_tokens = count_tokens or estimate_token_counts
+    sections = split_sections(text) if heading_aware else [(None, text)]
+
+    chunks = []
+    pending_words, pending_tokens, pending_heading = [], 0, None
+
+    def flush():
+        nonlocal pending_words, pending_tokens, pending_heading
+        if pending_words:
+            chunks.append({"content": " ".join(pending_words), "page": page,
+                           "heading": pending_heading, "token_count": pending_tokens})
+        pending_words, pending_tokens, pending_heading = [], 0, None
+
+    for heading, body in sections:
+        words = body.split()
+        if not words:
+            continue
+        counts = count_tokens(words)
+        total = sum(counts)
+
+        if total > max_tokens:
+            flush()
+            for start, end in sliding_windows(counts, max_tokens, overlap):
+                chunks.append({"content": " ".join(words[start:end]), "page": page,
+                               "heading": heading, "token_count": sum(counts[start:end])})
+            continue
+
+        if pending_tokens + total > max_tokens:
+            flush()
+        if not pending_words:
+            pending_heading = heading
+        pending_words.extend(words)
+        pending_tokens += total
+    flush()
+    return chunks
+
+
+def chunk_pages(pages: Iterable[tuple[int, str]], **kwargs) -> list[dict]:
+    """Chunks page by page so every chunk carries the page it came from."""
+    chunks = []
+    for page_number, text in pages:
+        chunks.extend(chunk_text(text, page=page_number, **kwargs))
+    return chunks
+
+
+def _chunk_options(tokenizer=None) -> dict:
+    return {
+        "max_tokens": int(os.environ.get("CHUNK_MAX_TOKENS", DEFAULT_MAX_TOKENS)),
+        "overlap": int(os.environ.get("CHUNK_OVERLAP", DEFAULT_OVERLAP)),
+        "count_tokens": tokenizer_token_counter(tokenizer) if tokenizer is not None else None,
+    }
+
+
+def chunk_document(content: str, pages: Optional[Iterable[tuple[int, str]]] = None,
+                   tokenizer=None) -> list[dict]:
+    """Chunks a document with the settings from the environment.
+
+    CHUNK_MAX_TOKENS and CHUNK_OVERLAP control the window size and overlap.
+    When ``pages`` is given, chunks never cross page boundaries. Chunks are
+    numbered with 'chunk_index' in document order.
+    """
+    options = _chunk_options(tokenizer)
+    chunks = chunk_pages(pages, **options) if pages is not None else chunk_text(content, **options)
+    for index, chunk in enumerate(chunks):
+        chunk["chunk_index"] = index
+    return chunks
+
+
+def iter_document_chunks(pages: Iterable[tuple[int, str]], tokenizer=None) -> Iterator[dict]:
+    """Lazy ``chunk_document`` for page streams: each page is chunked as soon as it arrives."""
+    options = _chunk_options(tokenizer)
+    index = 0
+    for page_number, text in pages:
+        for chunk in chunk_text(text, page=page_number, **options):
+            chunk["chunk_index"] = index
+            index += 1
+            yield chunk
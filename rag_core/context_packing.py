@@ -0,0 +1,176 @@
+import os
+import re
+import unicodedata
+from typing import Optional
+
+from rag_core.chunking import estimate_token_counts
+
+# Below this many tokens a trimmed snippet is too short to be useful.
+MIN_SNIPPET_TOKENS = 24
+ELLIPSIS = "…"
+PASSAGE_SEPARATOR = "\n...\n"
+
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?;:])\s+")
+_TERM = re.compile(r"\w{3,}")
+
+
+def default_budget() -> Optional[int]:
+    """Token budget used when a tool call does not pass one (CONTEXT_MAX_TOKENS, unset by default)."""
+    budget = os.environ.get("CONTEXT_MAX_TOKENS")
+    return int(budget) if budget else None
+
+
+def _fold(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def query_terms(query: str) -> set[str]:
+    return set(_TERM.findall(_fold(query)))
+
+
+def _cost(words: list[str]) -> tuple[int, int]:
+    """(estimated tokens, characters) of the words joined by spaces."""
+    if not words:
+        return 0, 0
+    return sum(estimate_token_counts(words)), sum(len(word) for word in words) + len(words) - 1
+
+
+def _overlap(left: list[str], right: list[str]) -> int:
+    """Number of words at the end of ``left`` repeated at the start of ``right``."""
+    for size in range(min(len(left), len(right)), 0, -1):
+        if left[-size:] == right[:size]:
+            return size
+    return 0
+
+
+def focused_snippet(words: list[str], terms: set[str], max_tokens: int, max_chars: int) -> list[str]:
+    """Cuts ``words`` down to the sentences around the best query match that fit the budget.
+
+    The sentence sharing the most terms with the query is kept and grown
+    with its neighbours, nearest first, while the budget allows. A single
+    sentence that is already too long is cut around its first matching word.
+    """
+    sentences = [sentence.split() for sentence in _SENTENCE_BREAK.split(" ".join(words)) if sentence.strip()]
+    scores = [len(terms & set(_TERM.findall(_fold(" ".join(sentence))))) for sentence in sentences]
+    best = max(range(len(sentences)), key=lambda i: scores[i])
+
+    def fits(candidate):
+        tokens, chars = _cost(candidate)
+        return tokens <= max_tokens and chars <= max_chars
+
+    first, last = best, best
+    if not fits(sentences[best]):
+        sentence = sentences[best]
+        hits = [i for i, word in enumerate(sentence) if set(_TERM.findall(_fold(word))) & terms]
+        start = max(0, (hits[0] if hits else 0) - 3)
+        end = start
+        while end < len(sentence) and fits(sentence[start:end + 1]):
+            end += 1
+        return sentence[start:end]
+
+    while True:
+        grown = False
+        for first_candidate, last_candidate in ((first, last + 1), (first - 1, last)):
+            if 0 <= first_candidate and last_candidate < len(sentences):
+                candidate = [word for sentence in sentences[first_candidate:last_candidate + 1] for word in sentence]
+                if fits(candidate):
+                    first, last, grown = first_candidate, last_candidate, True
+                    break
+        if not grown:
+            return [word for sentence in sentences[first:last + 1] for word in sentence]
+
+
+def pack_context(rows: list[tuple], query: str, limit: int, max_tokens: Optional[int] = None,
+                 max_chars: Optional[int] = None, passages_per_doc: int = 3,
+                 score_key: str = "similarity_score") -> list[dict]:
+    """Packs the best chunk hits into at most ``max_tokens``/``max_chars`` of text.
+
+    Chunks are taken greedily in score order (``rows`` as returned by
+    ``search_chunks``, best first), up to ``limit`` documents and
+    ``passages_per_doc`` chunks per document. Text repeated by overlapping
+    neighbouring chunks is counted and returned once, so adjacent chunks
+    merge into one passage, and chunks whose text was already taken from
+    another document are skipped. A chunk that no longer fits is cut to a
+    query-focused snippet. The top chunk is always returned, cut to the
+    budget however small it is, so a tight budget never leaves the caller
+    without context. The result has the shape of ``aggregate_by_document``.
+    """
+    max_tokens = max_tokens if max_tokens is not None else float("inf")
+    max_chars = max_chars if max_chars is not None else float("inf")
+    terms = query_terms(query)
+    used_tokens, used_chars = 0, 0
+    seen_texts = set()
+    documents = {}
+
+    for doc_id, subject, chunk_index, page, content, score in rows:
+        doc = documents.get(doc_id)
+        if doc is None and len(documents) >= limit:
+            continue
+        if doc is not None and len(doc["chunks"]) >= passages_per_doc:
+            continue
+        words = content.split()
+        fingerprint = " ".join(words).lower()
+        if fingerprint in seen_texts:
+            continue
+
+        chunks = doc["chunks"] if doc is not None else {}
+        start, end = 0, len(words)
+        if chunk_index - 1 in chunks:
+            start = _overlap(chunks[chunk_index - 1]["words"], words)
+        if chunk_index + 1 in chunks:
+            end -= _overlap(words[start:], chunks[chunk_index + 1]["words"])
+        words = words[start:end]
+        if not words:
+            continue
+
+        # Separators between passages count towards the character budget too
+        tokens, chars = _cost(words)
+        chars += len(PASSAGE_SEPARATOR)
+        snippet = False
+        if used_tokens + tokens > max_tokens or used_chars + chars > max_chars:
+            remaining_tokens = max_tokens - used_tokens
+            remaining_chars = max_chars - used_chars - len(PASSAGE_SEPARATOR) - 2 * len(ELLIPSIS)
+            first = not documents
+            if not first and (remaining_tokens < MIN_SNIPPET_TOKENS or remaining_chars < MIN_SNIPPET_TOKENS * 4):
+                break
+            snippet_words = focused_snippet(words, terms, max(remaining_tokens, 1), max(remaining_chars, 1))
+            if not snippet_words:
+                if not first:
+                    break
+                # Not even one word fits: the first one is cut to the budget
+                snippet_words = [words[0][:max(1, int(min(remaining_chars, remaining_tokens * 4)))]]
+            words = snippet_words
+            tokens, chars = _cost(words)
+            chars += len(PASSAGE_SEPARATOR) + 2 * len(ELLIPSIS)
+            snippet = True
+
+        seen_texts.add(fingerprint)
+        used_tokens += tokens
+        used_chars += chars
+        if doc is None:
+            doc = documents[doc_id] = {"id": doc_id, "subject": subject, score_key: score, "chunks": {}}
+        doc["chunks"][chunk_index] = {"words": words, "page": page, "score": score, "snippet": snippet}
+
+    results = []
+    for doc in documents.values():
+        chunks = doc.pop("chunks")
+        texts, passages, previous = [], [], None
+        for chunk_index in sorted(chunks):
+            chunk = chunks[chunk_index]
+            text = " ".join(chunk["words"])
+            if chunk["snippet"]:
+                texts.append(f"{ELLIPSIS}{text}{ELLIPSIS}")
+            elif previous is not None and previous == chunk_index - 1 and not chunks[previous]["snippet"]:
+                # Overlap already removed: neighbouring chunks read as one passage
+                texts[-1] += " " + text
+            else:
+                texts.append(text)
+            previous = chunk_index
+            passages.append({"chunk_index": chunk_index, "page": chunk["page"],
+                             score_key: round(chunk["score"], 4), "snippet": chunk["snippet"]})
+        doc["content"] = PASSAGE_SEPARATOR.join(texts)
+        doc[score_key] = round(doc[score_key], 4)
+        doc["passages"] = passages
+        results.append(doc)
+    return results
@@ -0,0 +1,200 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2 import pool as pg_pool
+from pgvector.psycopg2 import register_vector
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the pool timeout."""
+
+
+class _PooledConnection(psycopg2.extensions.connection):
+    """Connection that remembers its pgvector registration and last use."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.vector_registered = False
+        self.last_used = time.monotonic()
+
+
+class ConnectionPool:
+    """A bounded, thread-safe pool of pgvector-ready PostgreSQL connections.
+
+    Callers block (up to ``timeout`` seconds) while all ``maxconn`` connections
+    are checked out instead of failing immediately. Each connection has its
+    vector type registered once, and idle connections are health checked
+    before reuse.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, timeout: float = 30.0,
+                 health_check_interval: float = 30.0, **conn_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._pool = pg_pool.ThreadedConnectionPool(
+            minconn, maxconn, connection_factory=_PooledConnection, **conn_kwargs
+        )
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._checkouts = 0
+        self._in_use = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @contextmanager
+    def connection(self):
+        """Borrows a connection, committing on success and rolling back on error."""
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeoutError(f"No PostgreSQL connection available after {self.timeout}s.")
+
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    pass
+            raise
+        finally:
+            self._checkin(conn)
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def _checkout(self) -> _PooledConnection:
+        # A pool slot is already reserved, so a few retries are enough to
+        # replace connections that turn out to be dead.
+        for _ in range(self.maxconn + 1):
+            conn = self._pool.getconn()
+            if self._is_healthy(conn):
+                if not conn.vector_registered:
+                    register_vector(conn)
+                    conn.commit()
+                    conn.vector_registered = True
+                return conn
+            self._discard(conn)
+        raise psycopg2.OperationalError("Could not obtain a healthy PostgreSQL connection.")
+
+    def _is_healthy(self, conn: _PooledConnection) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - conn.last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+    def _checkin(self, conn: _PooledConnection):
+        status = conn.info.transaction_status if not conn.closed else None
+        if status is None or status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            self._discard(conn)
+            return
+        if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        conn.last_used = time.monotonic()
+        self._pool.putconn(conn)
+
+    def _discard(self, conn: _PooledConnection):
+        with self._lock:
+            self._discarded += 1
+        self._pool.putconn(conn, close=True)
+
+    def metrics(self) -> dict:
+        """Returns a snapshot of checkout and wait-time counters."""
+        with self._lock:
+            return {
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "in_use": self._in_use,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "discarded_connections": self._discarded,
+                "wait_seconds_total": round(self._wait_total, 6),
+                "wait_seconds_max": round(self._wait_max, 6),
+                "wait_seconds_avg": round(self._wait_total / self._checkouts, 6) if self._checkouts else 0.0,
+            }
+
+    def close(self):
+        self._pool.closeall()
+
+
+# --- Process-wide pool --- #
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Returns the process-wide pool, creating it on first use.
+
+    Sizing is read from the environment when the pool is created:
+    POSTGRES_POOL_MIN, POSTGRES_POOL_MAX, POSTGRES_POOL_TIMEOUT (seconds a
+    caller waits for a free connection) and POSTGRES_POOL_HEALTH_CHECK_INTERVAL
+    (idle seconds after which a connection is pinged before reuse).
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    int(os.environ.get("POSTGRES_POOL_MIN", "1")),
+                    int(os.environ.get("POSTGRES_POOL_MAX", "10")),
+                    timeout=float(os.environ.get("POSTGRES_POOL_TIMEOUT", "30")),
+                    health_check_interval=float(os.environ.get("POSTGRES_POOL_HEALTH_CHECK_INTERVAL", "30")),
+                    dbname=os.environ.get("POSTGRES_DB", "vectordb"),
+                    user=os.environ.get("POSTGRES_USER", "user"),
+                    password=os.environ.get("POSTGRES_PASSWORD", "password"),
+                    host=os.environ.get("POSTGRES_HOST", "localhost"),
+                )
+    return _pool
+
+
+def pooled_connection():
+    """Context manager that borrows a connection from the process-wide pool."""
+    return get_pool().connection()
+
+
+def get_pool_metrics() -> dict:
+    """Returns pool metrics, or a placeholder if the pool was never used."""
+    if _pool is None:
+        return {"initialized": False}
+    return {"initialized": True, **_pool.metrics()}
+
+
+def close_pool():
+    """Closes every pooled connection. Safe to call more than once."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
@@ -0,0 +1,206 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from rag_core.embeddings import embedding_namespace
+
+_WHITESPACE = re.compile(r"\s+")
+
+# The SQLite tier is pruned on open and then once per this many writes, so it
+# can exceed its cap by at most this many rows between prunes
+DISK_PRUNE_INTERVAL = 100
+
+
+def normalize_query(text: str) -> str:
+    """Normalizes query text for cache keys.
+
+    all-MiniLM-L6-v2 is an uncased model, so case and surrounding or repeated
+    whitespace do not change its embedding.
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip().lower()
+
+
+class EmbeddingCache:
+    """Thread-safe LRU cache of embeddings with TTL and an optional SQLite tier.
+
+    The in-memory tier holds at most ``max_size`` entries; entries older
+    than ``ttl`` seconds are treated as misses. With ``disk_path`` every
+    entry is also written to SQLite, so a restarted process starts warm.
+    Expired rows are deleted from SQLite, and the oldest rows beyond
+    ``disk_max_size`` (0 for no cap) are evicted, when it is opened and every
+    ``DISK_PRUNE_INTERVAL`` writes.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 86400.0, disk_path: Optional[str] = None,
+                 namespace: str = "", disk_max_size: int = 100000):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.disk_max_size = disk_max_size
+        self.namespace = namespace
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._disk_evictions = 0
+        self._writes_since_prune = 0
+        self._disk = None
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, created REAL NOT NULL, "
+                "dtype TEXT NOT NULL, vector BLOB NOT NULL)"
+            )
+            self._disk.execute("CREATE INDEX IF NOT EXISTS embeddings_created ON embeddings (created)")
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Deletes expired rows and the oldest rows beyond disk_max_size; called with the lock held after __init__."""
+        if self.ttl > 0:
+            self._disk_evictions += self._disk.execute(
+                "DELETE FROM embeddings WHERE created < ?", (time.time() - self.ttl,)
+            ).rowcount
+        if self.disk_max_size > 0:
+            self._disk_evictions += self._disk.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.disk_max_size,)
+            ).rowcount
+        self._disk.commit()
+        self._writes_since_prune = 0
+
+    def _key(self, text: str) -> str:
+        return f"{self.namespace}:{normalize_query(text)}"
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl > 0 and time.time() - created > self.ttl
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = self._key(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, embedding = entry
+                if not self._expired(created):
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return embedding
+                del self._entries[key]
+
+            if self._disk is not None:
+                row = self._disk.execute(
+                    "SELECT created, dtype, vector FROM embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[0]):
+                    embedding = np.frombuffer(row[2], dtype=row[1])
+                    self._store(key, row[0], embedding)
+                    self._disk_hits += 1
+                    return embedding
+
+            self._misses += 1
+            return None
+
+    def put(self, text: str, embedding: np.ndarray):
+        key = self._key(text)
+        embedding = np.asarray(embedding)
+        embedding.setflags(write=False)
+        created = time.time()
+        with self._lock:
+            self._store(key, created, embedding)
+            if self._disk is not None:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, created, dtype, vector) VALUES (?, ?, ?, ?)",
+                    (key, created, embedding.dtype.str, embedding.tobytes())
+                )
+                self._disk.commit()
+                self._writes_since_prune += 1
+                if self._writes_since_prune >= DISK_PRUNE_INTERVAL:
+                    self._prune_disk()
+
+    def _store(self, key: str, created: float, embedding: np.ndarray):
+        self._entries[key] = (created, embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def get_or_compute(self, text: str, compute) -> np.ndarray:
+        """Returns the cached embedding for ``text`` or stores ``compute(text)``."""
+        embedding = self.get(text)
+        if embedding is None:
+            embedding = compute(text)
+            self.put(text, embedding)
+        return embedding
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM embeddings")
+                self._disk.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._disk_hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": round((self._hits + self._disk_hits) / lookups, 4) if lookups else 0.0,
+                "disk_enabled": self._disk is not None,
+                "disk_max_size": self.disk_max_size,
+                "disk_evictions": self._disk_evictions,
+            }
+
+
+# --- Process-wide query cache --- #
+
+_query_cache = None
+_query_cache_lock = threading.Lock()
+
+
+def get_query_embedding_cache() -> EmbeddingCache:
+    """Returns the process-wide cache of query embeddings, creating it on first use.
+
+    Configured with EMBEDDING_CACHE_SIZE (entries, default 1024),
+    EMBEDDING_CACHE_TTL (seconds, default 86400; 0 disables expiry) and
+    EMBEDDING_CACHE_PATH (SQLite file for the on-disk tier; unset keeps the
+    cache in memory only) and EMBEDDING_CACHE_DISK_SIZE (rows kept on disk,
+    default 100000; 0 removes the cap).
+    """
+    global _query_cache
+    if _query_cache is None:
+        with _query_cache_lock:
+            if _query_cache is None:
+                _query_cache = EmbeddingCache(
+                    max_size=int(os.environ.get("EMBEDDING_CACHE_SIZE", "1024")),
+                    ttl=float(os.environ.get("EMBEDDING_CACHE_TTL", "86400")),
+                    disk_path=os.environ.get("EMBEDDING_CACHE_PATH") or None,
+                    namespace=embedding_namespace(),
+                    disk_max_size=int(os.environ.get("EMBEDDING_CACHE_DISK_SIZE", "100000")),
+                )
+    return _query_cache
+
+
+def cached_query_embedding(model, query: str) -> np.ndarray:
+    """Encodes a search query through the process-wide cache."""
+    return get_query_embedding_cache().get_or_compute(query, model.encode)
+
+
+def get_query_cache_stats() -> dict:
+    if _query_cache is None:
+        return {"initialized": False}
+    return {"initialized": True, **_query_cache.stats()}
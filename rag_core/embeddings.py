@@ -0,0 +1,87 @@
+import os
+import threading
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Backends share the same weights and produce the same 384-dim vectors.
+# The ONNX variants need `pip install sentence-transformers[onnx]`.
+BACKENDS = ("torch", "onnx", "onnx-int8")
+# Dynamically quantized (int8) export published with the model; AVX2 runs on any recent x86 CPU.
+DEFAULT_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def embedding_backend() -> str:
+    backend = os.environ.get("EMBEDDING_BACKEND", "torch")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}'. Supported backends are {list(BACKENDS)}")
+    return backend
+
+
+def embedding_namespace() -> str:
+    """Identifies model and backend, e.g. for cache keys that must not mix vectors."""
+    return f"{MODEL_NAME}:{embedding_backend()}"
+
+
+def _embedding_threads():
+    threads = os.environ.get("EMBEDDING_THREADS")
+    return int(threads) if threads else None
+
+
+def _onnx_kwargs(file_name: str = None) -> dict:
+    kwargs = {"file_name": file_name} if file_name else {}
+    threads = _embedding_threads()
+    if threads:
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        kwargs["session_options"] = options
+    return kwargs
+
+
+def load_model(backend: str = "torch"):
+    """Builds a new SentenceTransformer for ``backend``. Prefer ``get_model`` outside benchmarks."""
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        threads = _embedding_threads()
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return SentenceTransformer(MODEL_NAME)
+    if backend == "onnx":
+        return SentenceTransformer(MODEL_NAME, backend="onnx", model_kwargs=_onnx_kwargs())
+    if backend == "onnx-int8":
+        file_name = os.environ.get("EMBEDDING_ONNX_FILE", DEFAULT_INT8_FILE)
+        return SentenceTransformer(MODEL_NAME, backend="onnx", model_kwargs=_onnx_kwargs(file_name))
+    raise ValueError(f"Unknown embedding backend '{backend}'. Supported backends are {list(BACKENDS)}")
+
+
+def get_model():
+    """Returns the process-wide embedding model, loading it on first use.
+
+    Every tool and ingestion script shares this single instance. Set
+    EMBEDDING_THREADS to cap the CPU threads used for encoding and
+    EMBEDDING_BACKEND to 'onnx' or 'onnx-int8' to run on ONNX Runtime
+    (EMBEDDING_ONNX_FILE picks another quantized export for 'onnx-int8').
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                backend = embedding_backend()
+                print(f"Carregando modelo SentenceTransformer (backend {backend})...")
+                _model = load_model(backend)
+                print("Modelo carregado.")
+    return _model
+
+
+def is_loaded() -> bool:
+    return _model is not None
+
+
+def warmup():
+    """Loads the model and runs one encode so the first real query is not slowed down."""
+    get_model().encode("warmup")
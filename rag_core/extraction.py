@@ -0,0 +1,178 @@
+import io
+import re
+from importlib import metadata
+from typing import BinaryIO, Iterator
+
+from pypdf import PdfReader
+
+PageStream = Iterator[tuple[int, str]]
+
+# TXT and MD have no pages: text is yielded in blocks of about this many
+# characters, cut at blank lines, so chunking can start before the end of the file.
+TEXT_BLOCK_CHARS = 8000
+
+_HTML_TAG = re.compile(r"<[^<]+?>")
+
+
+def iter_pdf_pages(file_stream: BinaryIO) -> PageStream:
+    """Yields (page_number, text) for each PDF page, parsing one page at a time."""
+    reader = PdfReader(file_stream)
+    for number, page in enumerate(reader.pages, start=1):
+        yield number, page.extract_text() or ""
+
+
+def iter_pdfplumber_pages(path: str) -> PageStream:
+    """Like ``iter_pdf_pages`` with pdfplumber, releasing each page's layout objects once read."""
+    import pdfplumber
+
+    with pdfplumber.open(path) as pdf:
+        for number, page in enumerate(pdf.pages, start=1):
+            text = page.extract_text() or ""
+            page.close()
+            yield number, text
+
+
+def iter_docx_pages(file_stream: BinaryIO) -> PageStream:
+    """Yields (page_number, text) for a DOCX, using the page breaks stored in the file.
+
+    Word records where it last broke pages; when a file has none of those,
+    explicit page breaks are used instead.
+    """
+    import docx
+
+    document = docx.Document(file_stream)
+    body = document.element.body
+    if body.xpath('.//w:lastRenderedPageBreak'):
+        breaks = './/w:lastRenderedPageBreak'
+    else:
+        breaks = './/w:br[@w:type="page"]'
+
+    number, paragraphs = 1, []
+    for paragraph in document.paragraphs:
+        if paragraph._element.xpath(breaks) and paragraphs:
+            yield number, "\n".join(paragraphs)
+            number, paragraphs = number + 1, []
+        paragraphs.append(paragraph.text)
+    if paragraphs:
+        yield number, "\n".join(paragraphs)
+
+
+def _iter_text_blocks(file_stream: BinaryIO, code_fences: bool = False) -> PageStream:
+    """Yields UTF-8 text in blocks cut at blank lines; form feeds start a new page."""
+    reader = io.TextIOWrapper(file_stream, encoding="utf-8")
+    number, lines, size, in_fence = 1, [], 0, False
+    try:
+        for line in reader:
+            while "\f" in line:
+                before, line = line.split("\f", 1)
+                lines.append(before)
+                yield number, "".join(lines)
+                number, lines, size = number + 1, [], 0
+            if code_fences and line.lstrip().startswith("```"):
+                in_fence = not in_fence
+            lines.append(line)
+            size += len(line)
+            if size >= TEXT_BLOCK_CHARS and not line.strip() and not in_fence:
+                yield number, "".join(lines)
+                lines, size = [], 0
+        if lines:
+            yield number, "".join(lines)
+    finally:
+        # Leave the caller's stream open
+        reader.detach()
+
+
+def iter_txt_pages(file_stream: BinaryIO) -> PageStream:
+    return _iter_text_blocks(file_stream)
+
+
+def iter_md_pages(file_stream: BinaryIO) -> PageStream:
+    """Yields Markdown blocks converted to plain text; code fences are never split."""
+    import markdown
+
+    for number, block in _iter_text_blocks(file_stream, code_fences=True):
+        # A simple conversion to text; might need more sophisticated parsing for complex MD
+        yield number, _HTML_TAG.sub('', markdown.markdown(block))
+
+
+PAGE_EXTRACTORS = {
+    '.pdf': iter_pdf_pages,
+    '.docx': iter_docx_pages,
+    '.txt': iter_txt_pages,
+    '.md': iter_md_pages,
+}
+
+
+# Bump when the extraction code changes so results cached with older code are not reused.
+EXTRACTION_REVISION = 1
+
+# Library each extractor relies on; its installed version is part of the extractor version.
+_EXTRACTOR_PACKAGES = {
+    'iter_pdf_pages': "pypdf",
+    'iter_pdfplumber_pages': "pdfplumber",
+    'iter_docx_pages': "python-docx",
+    'iter_md_pages': "Markdown",
+}
+
+
+def extractor_version(extractor) -> str:
+    """Identifies an extractor, our revision of it and the library version it runs on."""
+    name = extractor.__name__
+    package = _EXTRACTOR_PACKAGES.get(name)
+    try:
+        library = f"{package}-{metadata.version(package)}" if package else "builtin"
+    except metadata.PackageNotFoundError:
+        library = f"{package}-unknown"
+    return f"{name}:{EXTRACTION_REVISION}:{library}"
+
+
+# Bytes a file of each binary type starts with. Readers accept up to 1 KiB of
+# junk before the PDF header, so it is searched for rather than anchored.
+FILE_SIGNATURES = {
+    '.pdf': b"%PDF-",
+    '.docx': b"PK\x03\x04",
+}
+SIGNATURE_BYTES = 1024
+
+
+def matches_signature(file_extension: str, head: bytes) -> bool:
+    """Checks the first bytes of a file against what its extension promises.
+
+    Text formats must be UTF-8 without NUL bytes; a multi-byte character cut
+    at the end of ``head`` is tolerated.
+    """
+    signature = FILE_SIGNATURES.get(file_extension)
+    if signature is not None:
+        return signature in head[:SIGNATURE_BYTES] if file_extension == '.pdf' else head.startswith(signature)
+    if b"\x00" in head:
+        return False
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        return e.reason == "unexpected end of data"
+    return True
+
+
+def join_pages(pages) -> str:
+    return "\n".join(text for _, text in pages)
+
+
+class PageTextCollector:
+    """Passes a page stream through while keeping the page texts for the document body."""
+
+    def __init__(self, pages):
+        self._pages = pages
+        self._texts = []
+
+    def __iter__(self) -> PageStream:
+        for number, text in self._pages:
+            self._texts.append(text)
+            yield number, text
+
+    @property
+    def pages_seen(self) -> int:
+        return len(self._texts)
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self._texts)
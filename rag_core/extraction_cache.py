@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Optional
+
+from rag_core.extraction import PageStream, extractor_version
+
+_HASH_BLOCK_SIZE = 1 << 20
+
+
+def hash_stream(file_stream) -> str:
+    """Returns the SHA-256 of a seekable binary stream and rewinds it."""
+    digest = hashlib.sha256()
+    file_stream.seek(0)
+    for block in iter(lambda: file_stream.read(_HASH_BLOCK_SIZE), b""):
+        digest.update(block)
+    file_stream.seek(0)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """On-disk cache of extracted pages, keyed by content hash and extractor version.
+
+    Each entry is a JSON Lines file with one (page_number, text) pair per
+    line, so hits stream back page by page like a live extraction. Reading
+    an entry refreshes its mtime; when the directory grows past
+    ``max_bytes`` the least recently used entries are deleted. Entries are
+    written to a temporary file and renamed into place, so several
+    processes can share the directory.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._entries())
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".jsonl"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def _path(self, content_hash: str, extractor) -> str:
+        key = hashlib.sha256(f"{extractor_version(extractor)}:{content_hash}".encode()).hexdigest()
+        return os.path.join(self.directory, key[:2], f"{key}.jsonl")
+
+    def get(self, content_hash: str, extractor) -> Optional[PageStream]:
+        """Returns the cached page stream, or None on a miss."""
+        path = self._path(content_hash, extractor)
+        try:
+            stream = open(path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            with self._lock:
+                self._misses += 1
+            return None
+        os.utime(path)
+        with self._lock:
+            self._hits += 1
+        return self._read(stream)
+
+    @staticmethod
+    def _read(stream) -> PageStream:
+        with stream:
+            for line in stream:
+                number, text = json.loads(line)
+                yield number, text
+
+    def record(self, content_hash: str, extractor, pages) -> PageStream:
+        """Passes ``pages`` through and stores them once the stream is fully consumed."""
+        path = self._path(content_hash, extractor)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        completed = False
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as tmp:
+                for number, text in pages:
+                    tmp.write(json.dumps([number, text], ensure_ascii=False) + "\n")
+                    yield number, text
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+            completed = True
+            with self._lock:
+                self._size += size
+            self._evict()
+        finally:
+            if not completed and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def pages(self, extractor, source, content_hash: Optional[str] = None) -> PageStream:
+        """Returns ``extractor(source)`` from the cache, extracting and storing it on a miss.
+
+        ``source`` is a path or a seekable binary stream; its content is
+        hashed unless ``content_hash`` is given.
+        """
+        if content_hash is None:
+            if isinstance(source, str):
+                with open(source, 'rb') as f:
+                    content_hash = hash_stream(f)
+            else:
+                content_hash = hash_stream(source)
+        cached = self.get(content_hash, extractor)
+        if cached is not None:
+            return cached
+        return self.record(content_hash, extractor, extractor(source))
+
+    def _evict(self):
+        with self._lock:
+            if self._size <= self.max_bytes:
+                return
+            # Other processes write here too, so the directory is the source of truth
+            entries = sorted(self._entries(), key=lambda entry: entry[2])
+            self._size = sum(size for _, size, _ in entries)
+            for path, size, _ in entries:
+                if self._size <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                self._size -= size
+                self._evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "directory": self.directory,
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# --- Process-wide cache --- #
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> Optional[ExtractionCache]:
+    """Returns the process-wide extraction cache, creating it on first use.
+
+    Configured with EXTRACTION_CACHE_DIR (default '.cache/extraction') and
+    EXTRACTION_CACHE_MAX_BYTES (default 1 GiB; 0 disables the cache).
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                max_bytes = int(os.environ.get("EXTRACTION_CACHE_MAX_BYTES", str(1 << 30)))
+                if max_bytes <= 0:
+                    return None
+                _cache = ExtractionCache(os.environ.get("EXTRACTION_CACHE_DIR", ".cache/extraction"), max_bytes)
+    return _cache
+
+
+def cached_pages(extractor, source, content_hash: Optional[str] = None) -> PageStream:
+    """Extracts ``source`` through the process-wide cache, or directly when it is disabled."""
+    cache = get_extraction_cache()
+    if cache is None:
+        return extractor(source)
+    return cache.pages(extractor, source, content_hash)
+
+
+def get_extraction_cache_stats() -> dict:
+    if _cache is None:
+        return {"initialized": False}
+    return {"initialized": True, **_cache.stats()}
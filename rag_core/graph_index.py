@@ -0,0 +1,104 @@
+import os
+import re
+from typing import Optional
+
+from rag_core.graph_loader import public_properties
+
+FULLTEXT_INDEX_NAME = "entity_search"
+SEARCHABLE_LABELS = ("Document", "Subject", "Pessoa", "Habilidade", "Empresa", "Instituicao")
+SEARCHABLE_PROPERTIES = ("name", "subject", "id")
+# Lucene's Brazilian Portuguese analyzer lowercases, drops stop words and
+# strips accents while stemming, so "Política" matches "politica".
+DEFAULT_ANALYZER = "brazilian"
+# Index hits fetched per result when filtering by collection
+COLLECTION_OVERFETCH = 4
+
+_LUCENE_SPECIAL = re.compile(r'([+\-!(){}\[\]^"~*?:\\/]|&&|\|\|)')
+
+
+def _quote(name: str) -> str:
+    return "`" + name.replace("`", "``") + "`"
+
+
+def fulltext_analyzer() -> str:
+    return os.environ.get("NEO4J_FULLTEXT_ANALYZER", DEFAULT_ANALYZER)
+
+
+def _index_definition(session, name: str):
+    record = session.run(
+        "SHOW FULLTEXT INDEXES YIELD name, labelsOrTypes, properties, options WHERE name = $name "
+        "RETURN labelsOrTypes, properties, options",
+        name=name
+    ).single()
+    if record is None:
+        return None
+    analyzer = record["options"].get("indexConfig", {}).get("fulltext.analyzer")
+    return set(record["labelsOrTypes"]), set(record["properties"]), analyzer
+
+
+def ensure_fulltext_index(driver, labels=SEARCHABLE_LABELS, properties=SEARCHABLE_PROPERTIES,
+                          analyzer=None, name: str = FULLTEXT_INDEX_NAME, recreate: bool = False) -> str:
+    """Creates the full-text index used by graph search, refreshing it when its definition changed.
+
+    Full-text indexes cannot be altered, so a changed label list, property
+    list or analyzer (or ``recreate=True``) drops and rebuilds the index.
+    Returns 'created', 'recreated' or 'unchanged'.
+    """
+    analyzer = analyzer or fulltext_analyzer()
+    wanted = (set(labels), set(properties), analyzer)
+    with driver.session() as session:
+        current = _index_definition(session, name)
+        if current == wanted and not recreate:
+            return "unchanged"
+        if current is not None:
+            session.run(f"DROP INDEX {_quote(name)} IF EXISTS").consume()
+
+        label_expr = "|".join(_quote(label) for label in labels)
+        property_expr = ", ".join(f"n.{_quote(prop)}" for prop in properties)
+        session.run(
+            f"CREATE FULLTEXT INDEX {_quote(name)} IF NOT EXISTS FOR (n:{label_expr}) ON EACH [{property_expr}] "
+            "OPTIONS {indexConfig: {`fulltext.analyzer`: $analyzer}}",
+            analyzer=analyzer
+        ).consume()
+        session.run("CALL db.awaitIndex($name, 300)", name=name).consume()
+    return "created" if current is None else "recreated"
+
+
+def build_fulltext_query(search_term: str) -> str:
+    """Turns free text into a Lucene query matching any of its terms.
+
+    Lucene operators in the input are escaped so user text cannot break the
+    query syntax.
+    """
+    terms = [_LUCENE_SPECIAL.sub(r"\\\1", term) for term in search_term.split()]
+    return " ".join(term for term in terms if term)
+
+
+def fulltext_search(tx, search_term: str, limit: int = 5, name: str = FULLTEXT_INDEX_NAME,
+                    collection: Optional[str] = None) -> list[dict]:
+    """Queries the full-text index, best match first.
+
+    ``tx`` can be a session or a managed transaction. Each result holds the
+    node properties plus 'labels' and 'relevance_score'. With ``collection``,
+    nodes recording another collection (Document nodes) are left out;
+    nodes without one are kept.
+    """
+    query = build_fulltext_query(search_term)
+    if not query:
+        return []
+    result = tx.run(
+        """
+        CALL db.index.fulltext.queryNodes($index, $query, {limit: $fetch})
+        YIELD node, score
+        WHERE $collection IS NULL OR node.collection IS NULL OR node.collection = $collection
+        RETURN node, labels(node) AS labels, score
+        LIMIT $limit
+        """,
+        index=name, query=query, limit=limit, collection=collection,
+        # Over-fetched so hits from other collections do not leave the result short
+        fetch=limit * COLLECTION_OVERFETCH if collection else limit
+    )
+    return [
+        {**public_properties(record["node"]), "labels": record["labels"], "relevance_score": round(record["score"], 4)}
+        for record in result
+    ]
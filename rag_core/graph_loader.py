@@ -0,0 +1,256 @@
+import time
+from collections import defaultdict
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def quote_name(name: str) -> str:
+    """Quotes a label or relationship type for safe use in Cypher."""
+    return "`" + name.replace("`", "``") + "`"
+
+
+def ensure_id_constraints(driver, labels):
+    """Creates a uniqueness constraint on ``id`` for each label.
+
+    Each constraint is backed by a range index, so MATCH/MERGE by label and
+    id become index seeks instead of label scans.
+    """
+    with driver.session() as session:
+        for label in sorted(set(labels)):
+            session.run(
+                f"CREATE CONSTRAINT {quote_name(label + '_id_unique')} IF NOT EXISTS "
+                f"FOR (n:{quote_name(label)}) REQUIRE n.id IS UNIQUE"
+            ).consume()
+
+
+def _batches(rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        yield rows[start:start + batch_size]
+
+
+def _write_batches(driver, query, rows, batch_size, **params):
+    def work(tx, batch):
+        return tx.run(query, rows=batch, **params).consume()
+
+    with driver.session() as session:
+        for batch in _batches(rows, batch_size):
+            session.execute_write(work, batch)
+
+
+# --- Diff-based sync --- #
+
+SOURCES_PROPERTY = "sync_sources"
+# Property keys each source set, as "<source><US><key>" entries, so a sync
+# only removes properties its own source wrote
+PROPERTIES_PROPERTY = "sync_properties"
+_KEY_SEPARATOR = "\x1f"
+# Bookkeeping of the sync, stored on nodes and relationships but never returned by searches
+SYNC_PROPERTIES = (SOURCES_PROPERTY, PROPERTIES_PROPERTY)
+
+
+def public_properties(item) -> dict:
+    """Properties of a Neo4j node or relationship without the sync bookkeeping."""
+    return {key: value for key, value in dict(item).items() if key not in SYNC_PROPERTIES}
+
+
+def _owned(properties: dict, source: str) -> dict:
+    """The properties among ``properties`` that ``source`` wrote, per its sync_properties entries."""
+    prefix = source + _KEY_SEPARATOR
+    keys = [entry[len(prefix):] for entry in properties.get(PROPERTIES_PROPERTY) or [] if entry.startswith(prefix)]
+    return {key: properties[key] for key in keys if key in properties}
+
+
+def _group_desired(graph_data: dict):
+    nodes = {}
+    for node in graph_data.get('nodes', []):
+        nodes[(node['label'], node['id'])] = dict(node.get('properties', {}))
+    label_of = {node_id: label for label, node_id in nodes}
+
+    relationships = {}
+    skipped = 0
+    for rel in graph_data.get('relationships', []):
+        source_label = label_of.get(rel['source'])
+        target_label = label_of.get(rel['target'])
+        if source_label is None or target_label is None:
+            skipped += 1
+            continue
+        key = (rel['type'], source_label, rel['source'], target_label, rel['target'])
+        relationships[key] = dict(rel.get('properties', {}))
+    return nodes, relationships, skipped
+
+
+def _read_managed(tx, source: str):
+    nodes = {}
+    for record in tx.run(
+        f"MATCH (n) WHERE $source IN n.{SOURCES_PROPERTY} RETURN labels(n) AS labels, properties(n) AS properties",
+        source=source
+    ):
+        properties = _owned(record["properties"], source)
+        for label in record["labels"]:
+            nodes[(label, record["properties"].get("id"))] = properties
+
+    relationships = {}
+    for record in tx.run(
+        f"MATCH (a)-[r]->(b) WHERE $source IN r.{SOURCES_PROPERTY} "
+        "RETURN type(r) AS type, labels(a) AS source_labels, a.id AS source, "
+        "labels(b) AS target_labels, b.id AS target, properties(r) AS properties",
+        source=source
+    ):
+        properties = _owned(record["properties"], source)
+        for source_label in record["source_labels"]:
+            for target_label in record["target_labels"]:
+                key = (record["type"], source_label, record["source"], target_label, record["target"])
+                relationships[key] = properties
+    return nodes, relationships
+
+
+def _property_delta(desired: dict, current) -> dict:
+    """Properties to SET with ``+=``: desired values plus nulls for the ones to remove.
+
+    ``current`` only holds the properties this source wrote, so properties
+    set by other sources or by uploads are left alone.
+    """
+    delta = dict(desired)
+    for key in (current or {}):
+        if key not in desired:
+            delta[key] = None
+    return delta
+
+
+def diff_graph(desired_nodes: dict, desired_rels: dict, current_nodes: dict, current_rels: dict) -> dict:
+    """Returns the node and relationship upserts and deletions that turn current into desired."""
+    return {
+        "node_upserts": [
+            (key, _property_delta(properties, current_nodes.get(key)))
+            for key, properties in desired_nodes.items() if current_nodes.get(key) != properties
+        ],
+        "node_deletes": [key for key in current_nodes if key not in desired_nodes],
+        "rel_upserts": [
+            (key, _property_delta(properties, current_rels.get(key)))
+            for key, properties in desired_rels.items() if current_rels.get(key) != properties
+        ],
+        "rel_deletes": [key for key in current_rels if key not in desired_rels],
+    }
+
+
+def _group_rows(items, group_of, row_of) -> dict:
+    groups = defaultdict(list)
+    for key, properties in items:
+        groups[group_of(key)].append(row_of(key, properties))
+    return groups
+
+
+def sync_graph(driver, graph_data: dict, source: str, batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    """Brings the part of the graph owned by ``source`` in line with ``graph_data``.
+
+    Every node and relationship written here lists ``source`` in its
+    sync_sources property. The current state of those is read back and
+    compared with ``graph_data``; only new or changed items are MERGEd and
+    only items no longer present are removed, in UNWIND batches. Items
+    shared with another source lose this source but are kept, and nodes
+    created elsewhere (e.g. uploaded documents) are never touched, so the
+    graph stays complete and queryable during the sync. The property keys
+    written are recorded per source in sync_properties, and only those are
+    removed when they disappear from ``graph_data``.
+    Returns counts and timings for the sync.
+    """
+    desired_nodes, desired_rels, skipped = _group_desired(graph_data)
+    ensure_id_constraints(driver, {label for label, _ in desired_nodes})
+
+    start = time.perf_counter()
+    with driver.session() as session:
+        current_nodes, current_rels = session.execute_read(_read_managed, source)
+    diff = diff_graph(desired_nodes, desired_rels, current_nodes, current_rels)
+    read_seconds = time.perf_counter() - start
+
+    prefix = source + _KEY_SEPARATOR
+    add_source = (
+        f"SET x.{SOURCES_PROPERTY} = CASE WHEN $source IN coalesce(x.{SOURCES_PROPERTY}, []) "
+        f"THEN x.{SOURCES_PROPERTY} ELSE coalesce(x.{SOURCES_PROPERTY}, []) + $source END"
+    )
+    own_keys = (
+        f", x.{PROPERTIES_PROPERTY} = [k IN coalesce(x.{PROPERTIES_PROPERTY}, []) WHERE NOT k STARTS WITH $prefix] "
+        f"+ [k IN row.keys | $prefix + k]"
+    )
+    drop_source = (
+        f"SET x.{SOURCES_PROPERTY} = [s IN x.{SOURCES_PROPERTY} WHERE s <> $source], "
+        f"x.{PROPERTIES_PROPERTY} = [k IN coalesce(x.{PROPERTIES_PROPERTY}, []) WHERE NOT k STARTS WITH $prefix]"
+    )
+
+    start = time.perf_counter()
+    for label, rows in _group_rows(
+        diff["node_upserts"], lambda key: key[0],
+        lambda key, props: {"id": key[1], "properties": props, "keys": sorted(desired_nodes[key])}
+    ).items():
+        query = f"UNWIND $rows AS row MERGE (x:{quote_name(label)} {{id: row.id}}) SET x += row.properties {add_source}{own_keys}"
+        _write_batches(driver, query, rows, batch_size, source=source, prefix=prefix)
+    node_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for (rel_type, source_label, target_label), rows in _group_rows(
+        diff["rel_upserts"], lambda key: (key[0], key[1], key[3]),
+        lambda key, props: {"source": key[2], "target": key[4], "properties": props, "keys": sorted(desired_rels[key])}
+    ).items():
+        query = (
+            f"UNWIND $rows AS row "
+            f"MATCH (a:{quote_name(source_label)} {{id: row.source}}) "
+            f"MATCH (b:{quote_name(target_label)} {{id: row.target}}) "
+            f"MERGE (a)-[x:{quote_name(rel_type)}]->(b) SET x += row.properties {add_source}{own_keys}"
+        )
+        _write_batches(driver, query, rows, batch_size, source=source, prefix=prefix)
+
+    for (rel_type, source_label, target_label), rows in _group_rows(
+        [(key, None) for key in diff["rel_deletes"]], lambda key: (key[0], key[1], key[3]),
+        lambda key, props: {"source": key[2], "target": key[4]}
+    ).items():
+        query = (
+            f"UNWIND $rows AS row "
+            f"MATCH (:{quote_name(source_label)} {{id: row.source}})-[x:{quote_name(rel_type)}]->"
+            f"(:{quote_name(target_label)} {{id: row.target}}) "
+            f"{drop_source} WITH x WHERE size(x.{SOURCES_PROPERTY}) = 0 DELETE x"
+        )
+        _write_batches(driver, query, rows, batch_size, source=source, prefix=prefix)
+    relationship_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for label, rows in _group_rows(
+        [(key, None) for key in diff["node_deletes"]], lambda key: key[0], lambda key, props: {"id": key[1]}
+    ).items():
+        query = (
+            f"UNWIND $rows AS row MATCH (x:{quote_name(label)} {{id: row.id}}) "
+            f"{drop_source} WITH x WHERE size(x.{SOURCES_PROPERTY}) = 0 DETACH DELETE x"
+        )
+        _write_batches(driver, query, rows, batch_size, source=source, prefix=prefix)
+    node_seconds += time.perf_counter() - start
+
+    return {
+        "nodes_upserted": len(diff["node_upserts"]),
+        "nodes_deleted": len(diff["node_deletes"]),
+        "nodes_unchanged": len(desired_nodes) - len(diff["node_upserts"]),
+        "relationships_upserted": len(diff["rel_upserts"]),
+        "relationships_deleted": len(diff["rel_deletes"]),
+        "relationships_unchanged": len(desired_rels) - len(diff["rel_upserts"]),
+        "skipped_relationships": skipped,
+        "read_seconds": read_seconds,
+        "node_seconds": node_seconds,
+        "relationship_seconds": relationship_seconds,
+        "write_seconds": node_seconds + relationship_seconds,
+    }
+
+
+def format_sync_stats(stats: dict) -> str:
+    nodes = stats['nodes_upserted'] + stats['nodes_deleted']
+    relationships = stats['relationships_upserted'] + stats['relationships_deleted']
+    node_rate = nodes / stats['node_seconds'] if stats['node_seconds'] else 0.0
+    rel_rate = relationships / stats['relationship_seconds'] if stats['relationship_seconds'] else 0.0
+    line = (
+        f"Neo4j sync: nodes +{stats['nodes_upserted']} -{stats['nodes_deleted']} "
+        f"({stats['nodes_unchanged']} unchanged) in {stats['node_seconds']:.2f}s ({node_rate:.1f} nodes/sec), "
+        f"relationships +{stats['relationships_upserted']} -{stats['relationships_deleted']} "
+        f"({stats['relationships_unchanged']} unchanged) in {stats['relationship_seconds']:.2f}s "
+        f"({rel_rate:.1f} rels/sec); read {stats['read_seconds']:.2f}s, write {stats['write_seconds']:.2f}s"
+    )
+    if stats['skipped_relationships']:
+        line += f", {stats['skipped_relationships']} relationships skipped (unknown endpoints)"
+    return line
+
@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed")
+
+
+class JobQueueFullError(Exception):
+    """Raised when the ingestion queue already holds its maximum of pending jobs."""
+
+
+class IngestionJobs:
+    """Runs ingestion work on a bounded thread pool and tracks each job's status.
+
+    At most ``max_workers`` jobs run at once and at most ``max_pending`` wait
+    for a worker; submitting beyond that raises ``JobQueueFullError``. The
+    registry keeps the ``history`` most recent finished jobs for status
+    lookups.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 100, history: int = 1000):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingestion")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, work, *args, description: str = "", **kwargs) -> dict:
+        """Queues ``work(*args, progress=..., **kwargs)`` and returns the new job.
+
+        ``progress`` is a callable the work uses to report its current stage.
+        """
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if job["status"] in ("queued", "running"))
+            if pending >= self.max_pending + self.max_workers:
+                raise JobQueueFullError(f"Ingestion queue is full ({self.max_pending} pending jobs)")
+            job_id = uuid.uuid4().hex
+            job = {
+                "id": job_id,
+                "description": description,
+                "status": "queued",
+                "stage": None,
+                "result": None,
+                "error": None,
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+            }
+            self._jobs[job_id] = job
+            self._trim()
+            snapshot = dict(job)
+        self._executor.submit(self._run, job_id, work, args, kwargs)
+        return snapshot
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _run(self, job_id: str, work, args, kwargs):
+        self._update(job_id, status="running", started_at=time.time())
+        try:
+            result = work(*args, progress=lambda stage: self._update(job_id, stage=stage), **kwargs)
+        except Exception as e:
+            self._update(job_id, status="failed", error=str(e), finished_at=time.time())
+        else:
+            self._update(job_id, status="succeeded", result=result, finished_at=time.time())
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in ("succeeded", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {status: 0 for status in JOB_STATUSES}
+            for job in self._jobs.values():
+                counts[job["status"]] += 1
+            return {"max_workers": self.max_workers, "max_pending": self.max_pending, **counts}
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+# --- Process-wide job queue --- #
+
+_jobs = None
+_jobs_lock = threading.Lock()
+
+
+def get_ingestion_jobs() -> IngestionJobs:
+    """Returns the process-wide ingestion queue, creating it on first use.
+
+    Configured with INGESTION_WORKERS (concurrent jobs, default 2) and
+    INGESTION_MAX_PENDING (jobs waiting for a worker, default 100).
+    Keeping INGESTION_WORKERS low leaves CPU for query embedding.
+    """
+    global _jobs
+    if _jobs is None:
+        with _jobs_lock:
+            if _jobs is None:
+                _jobs = IngestionJobs(
+                    max_workers=int(os.environ.get("INGESTION_WORKERS", "2")),
+                    max_pending=int(os.environ.get("INGESTION_MAX_PENDING", "100")),
+                )
+    return _jobs
+
+
+def get_ingestion_stats() -> dict:
+    if _jobs is None:
+        return {"initialized": False}
+    return {"initialized": True, **_jobs.stats()}
+
+
+def close_ingestion_jobs(wait: bool = True):
+    """Waits for running jobs and stops the workers."""
+    global _jobs
+    with _jobs_lock:
+        if _jobs is not None:
+            _jobs.shutdown(wait=wait)
+            _jobs = None
@@ -0,0 +1,140 @@
+import hashlib
+import os
+from dataclasses import dataclass, field
+
+from psycopg2.extras import execute_values
+
+_HASH_BLOCK_SIZE = 1 << 20
+
+
+def ensure_manifest(conn):
+    """Creates the table recording which file produced which document."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ingestion_manifest (
+                source TEXT NOT NULL,
+                file_name TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                subject TEXT,
+                sha256 TEXT NOT NULL,
+                size BIGINT NOT NULL,
+                mtime DOUBLE PRECISION NOT NULL,
+                ingested_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (source, file_name)
+            );
+            """
+        )
+        # NULL on rows written before collections, so their files are ingested again once
+        cur.execute("ALTER TABLE ingestion_manifest ADD COLUMN IF NOT EXISTS collection TEXT;")
+        cur.execute("CREATE INDEX IF NOT EXISTS ingestion_manifest_doc_id_idx ON ingestion_manifest (doc_id);")
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(conn, source: str) -> dict:
+    """Returns the manifest rows of ``source`` keyed by file name."""
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT file_name, doc_id, subject, collection, sha256, size, mtime FROM ingestion_manifest WHERE source = %s;",
+            (source,)
+        )
+        return {
+            row[0]: {"doc_id": row[1], "subject": row[2], "collection": row[3], "sha256": row[4], "size": row[5], "mtime": row[6]}
+            for row in cur.fetchall()
+        }
+
+
+@dataclass
+class SyncPlan:
+    """What an incremental run has to do to bring the stores in line with a directory.
+
+    ``files`` maps every current file name to its manifest entry.
+    ``to_ingest`` maps each document to extract and embed to the file it is
+    read from, ``aliases`` lists every file name behind each document, and
+    ``to_delete`` holds documents whose files are all gone.
+    """
+    files: dict = field(default_factory=dict)
+    to_ingest: dict = field(default_factory=dict)
+    aliases: dict = field(default_factory=dict)
+    to_delete: list = field(default_factory=list)
+    hashed: int = 0
+    unchanged: int = 0
+
+
+def plan_sync(directory: str, file_names: list[str], manifest: dict, subject: str, collection: str,
+              full: bool = False) -> SyncPlan:
+    """Compares the files in ``directory`` with the manifest.
+
+    Files whose size and mtime match the manifest are not read again.
+    Byte-identical files share one document, named after the first of them
+    unless the manifest already knows one. A document is (re)ingested when
+    its content, subject or collection is new to the manifest, or always
+    with ``full``.
+    """
+    plan = SyncPlan()
+    by_hash = {}
+    for file_name in sorted(file_names):
+        stat = os.stat(os.path.join(directory, file_name))
+        previous = manifest.get(file_name)
+        if previous and previous["size"] == stat.st_size and previous["mtime"] == stat.st_mtime:
+            sha256 = previous["sha256"]
+        else:
+            sha256 = hash_file(os.path.join(directory, file_name))
+            plan.hashed += 1
+        plan.files[file_name] = {"sha256": sha256, "size": stat.st_size, "mtime": stat.st_mtime,
+                                "subject": subject, "collection": collection}
+        by_hash.setdefault(sha256, []).append(file_name)
+
+    known = {}
+    for entry in manifest.values():
+        if entry["sha256"] in by_hash:
+            known.setdefault(entry["sha256"], set()).add((entry["doc_id"], entry["subject"], entry["collection"] or ""))
+
+    for sha256, names in by_hash.items():
+        previous = sorted(known.get(sha256, ()))
+        doc_id = previous[0][0] if previous else os.path.splitext(names[0])[0]
+        for file_name in names:
+            plan.files[file_name]["doc_id"] = doc_id
+        plan.aliases[doc_id] = names
+        if full or (doc_id, subject, collection) not in previous:
+            plan.to_ingest[doc_id] = names[0]
+        else:
+            plan.unchanged += len(names)
+
+    kept = set(plan.aliases)
+    plan.to_delete = sorted({entry["doc_id"] for entry in manifest.values()} - kept)
+    return plan
+
+
+def shared_doc_ids(conn, source: str, doc_ids: list[str]) -> set:
+    """Returns the documents among ``doc_ids`` that files of other sources still map to."""
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT DISTINCT doc_id FROM ingestion_manifest WHERE source <> %s AND doc_id = ANY(%s);",
+            (source, list(doc_ids))
+        )
+        return {row[0] for row in cur.fetchall()}
+
+
+def save_manifest(conn, source: str, files: dict):
+    """Replaces the manifest of ``source`` with ``files`` (file name -> entry)."""
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM ingestion_manifest WHERE source = %s AND NOT (file_name = ANY(%s));", (source, list(files)))
+        if files:
+            execute_values(
+                cur,
+                "INSERT INTO ingestion_manifest (source, file_name, doc_id, subject, collection, sha256, size, mtime) VALUES %s "
+                "ON CONFLICT (source, file_name) DO UPDATE SET doc_id = EXCLUDED.doc_id, subject = EXCLUDED.subject, "
+                "collection = EXCLUDED.collection, sha256 = EXCLUDED.sha256, size = EXCLUDED.size, mtime = EXCLUDED.mtime, ingested_at = now()",
+                [
+                    (source, file_name, entry["doc_id"], entry["subject"], entry["collection"], entry["sha256"], entry["size"], entry["mtime"])
+                    for file_name, entry in files.items()
+                ]
+            )
@@ -0,0 +1,54 @@
+import os
+import threading
+
+from neo4j import GraphDatabase
+
+_driver = None
+_driver_lock = threading.Lock()
+
+
+def get_driver():
+    """Returns the process-wide Neo4j driver, creating it on first use.
+
+    The driver keeps its own Bolt connection pool, so sessions opened from it
+    reuse connections instead of paying a handshake per query. Pool behaviour
+    is read from the environment when the driver is created:
+    NEO4J_POOL_MAX (max pooled connections), NEO4J_ACQUISITION_TIMEOUT
+    (seconds to wait for a free connection), NEO4J_LIVENESS_CHECK_TIMEOUT
+    (idle seconds after which a connection is pinged before reuse) and
+    NEO4J_MAX_CONNECTION_LIFETIME (seconds before a connection is recycled).
+    """
+    global _driver
+    if _driver is None:
+        with _driver_lock:
+            if _driver is None:
+                _driver = GraphDatabase.driver(
+                    os.environ.get("NEO4J_URI", "bolt://localhost:7687"),
+                    auth=(os.environ.get("NEO4J_USER", "neo4j"), os.environ.get("NEO4J_PASSWORD", "password")),
+                    max_connection_pool_size=int(os.environ.get("NEO4J_POOL_MAX", "50")),
+                    connection_acquisition_timeout=float(os.environ.get("NEO4J_ACQUISITION_TIMEOUT", "30")),
+                    liveness_check_timeout=float(os.environ.get("NEO4J_LIVENESS_CHECK_TIMEOUT", "30")),
+                    max_connection_lifetime=float(os.environ.get("NEO4J_MAX_CONNECTION_LIFETIME", "3600")),
+                )
+    return _driver
+
+
+def execute_read(work, *args, **kwargs):
+    """Runs ``work(tx, *args, **kwargs)`` in a managed read transaction, with retries."""
+    with get_driver().session() as session:
+        return session.execute_read(work, *args, **kwargs)
+
+
+def execute_write(work, *args, **kwargs):
+    """Runs ``work(tx, *args, **kwargs)`` in a managed write transaction, with retries."""
+    with get_driver().session() as session:
+        return session.execute_write(work, *args, **kwargs)
+
+
+def close_driver():
+    """Closes the shared driver and its pool. Safe to call more than once."""
+    global _driver
+    with _driver_lock:
+        if _driver is not None:
+            _driver.close()
+            _driver = None
@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+from typing import Optional
+
+# Multilingual (mMARCO) MiniLM cross-encoder: the corpus and the questions are in Portuguese.
+DEFAULT_RERANK_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+DEFAULT_BUDGET_MS = 300.0
+DEFAULT_CANDIDATES = 40
+DEFAULT_BATCH_SIZE = 16
+# Pairs in the first batch while no scoring time has been measured yet
+PROBE_BATCH_SIZE = 2
+
+_model = None
+_model_lock = threading.Lock()
+_loading = None
+
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "reranked": 0, "fallbacks": 0, "model_not_ready": 0, "total_ms": 0.0}
+# Moving average of the time to score one pair, carried across calls
+_per_pair_ms = None
+
+
+def rerank_enabled() -> bool:
+    """Whether search tools rerank when the caller does not say (RERANK_ENABLED, default off)."""
+    return os.environ.get("RERANK_ENABLED", "").lower() in ("1", "true", "yes")
+
+
+def rerank_candidates() -> int:
+    return int(os.environ.get("RERANK_CANDIDATES", str(DEFAULT_CANDIDATES)))
+
+
+def _load():
+    global _model
+    from sentence_transformers import CrossEncoder
+
+    model_name = os.environ.get("RERANK_MODEL", DEFAULT_RERANK_MODEL)
+    print(f"Carregando cross-encoder {model_name}...")
+    model = CrossEncoder(model_name, max_length=int(os.environ.get("RERANK_MAX_LENGTH", "256")))
+    print("Cross-encoder carregado.")
+    _model = model
+
+
+def get_reranker():
+    """Returns the process-wide cross-encoder, loading it on first use (RERANK_MODEL)."""
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _load()
+    return _model
+
+
+def _start_loading():
+    """Loads the cross-encoder on a background thread, once."""
+    global _loading
+    with _model_lock:
+        if _model is None and (_loading is None or not _loading.is_alive()):
+            _loading = threading.Thread(target=get_reranker, name="reranker-load", daemon=True)
+            _loading.start()
+
+
+def is_loaded() -> bool:
+    return _model is not None
+
+
+def warmup():
+    get_reranker().predict([("warmup", "warmup")])
+
+
+def _record(outcome: str, elapsed_ms: float, pairs: int = 0):
+    global _per_pair_ms
+    with _stats_lock:
+        _stats["calls"] += 1
+        _stats[outcome] += 1
+        _stats["total_ms"] += elapsed_ms
+        if pairs:
+            measured = elapsed_ms / pairs
+            _per_pair_ms = measured if _per_pair_ms is None else 0.8 * _per_pair_ms + 0.2 * measured
+
+
+def rerank_rows(query: str, rows: list[tuple], budget_ms: Optional[float] = None,
+                batch_size: int = DEFAULT_BATCH_SIZE) -> tuple[list[tuple], bool]:
+    """Reorders chunk rows by cross-encoder score within a time budget.
+
+    ``rows`` have the shape returned by ``search_chunks`` (content second to
+    last, score last). Pairs are scored in batches; before each batch,
+    including the first, the time it would take is estimated from the
+    batches so far or, before any, from earlier calls, and if it would
+    overrun ``budget_ms`` (RERANK_BUDGET_MS, default 300) the rows are
+    returned in their original ANN order. With no estimate yet, the first
+    batch is cut to PROBE_BATCH_SIZE pairs. Until the model has loaded, which
+    happens in the background on first use, rows are returned unchanged too.
+    Returns the rows, with the cross-encoder score as their last column when
+    reranked, and whether reranking happened.
+    """
+    if not rows:
+        return rows, False
+    if budget_ms is None:
+        budget_ms = float(os.environ.get("RERANK_BUDGET_MS", str(DEFAULT_BUDGET_MS)))
+    if _model is None:
+        _start_loading()
+        _record("model_not_ready", 0.0)
+        return rows, False
+
+    start = time.perf_counter()
+    scores = []
+    while len(scores) < len(rows):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        per_pair_ms = elapsed_ms / len(scores) if scores else _per_pair_ms
+        batch = rows[len(scores):len(scores) + (batch_size if per_pair_ms is not None else PROBE_BATCH_SIZE)]
+        if budget_ms <= 0 or elapsed_ms + (per_pair_ms or 0.0) * len(batch) > budget_ms:
+            _record("fallbacks", elapsed_ms, len(scores))
+            return rows, False
+        scores.extend(float(score) for score in _model.predict([(query, row[-2]) for row in batch], batch_size=batch_size))
+
+    _record("reranked", (time.perf_counter() - start) * 1000, len(scores))
+    reranked = sorted(
+        (row[:-1] + (score,) for row, score in zip(rows, scores)), key=lambda row: row[-1], reverse=True
+    )
+    return reranked, True
+
+
+def get_rerank_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["avg_ms"] = round(stats["total_ms"] / stats["calls"], 2) if stats["calls"] else 0.0
+    stats["total_ms"] = round(stats["total_ms"], 2)
+    stats["per_pair_ms"] = round(_per_pair_ms, 3) if _per_pair_ms is not None else None
+    stats["model_loaded"] = is_loaded()
+    return stats
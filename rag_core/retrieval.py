@@ -0,0 +1,187 @@
+import contextvars
+import functools
+import inspect
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from rag_core.chunk_store import check_collection
+from rag_core.graph_loader import public_properties
+from rag_core.neo4j_driver import execute_read
+from rag_core.tool_cache import mark_uncacheable
+
+DEFAULT_EXPANSION_LIMIT = 25
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Returns the shared pool used to fan retrieval calls out concurrently.
+
+    Its size is read from RETRIEVAL_WORKERS (default 8) on first use.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.environ.get("RETRIEVAL_WORKERS", "8")),
+                    thread_name_prefix="retrieval",
+                )
+    return _executor
+
+
+def _neighbors(tx, doc_ids: list[str], limit: int, collection: Optional[str] = None) -> list[dict]:
+    result = tx.run(
+        """
+        MATCH (d:Document) WHERE d.id IN $ids
+        MATCH (d)-[r]-(m)
+        WHERE $collection IS NULL OR m.collection IS NULL OR m.collection = $collection
+        RETURN d.id AS seed, type(r) AS type, startNode(r) = d AS outgoing, m AS node, labels(m) AS labels
+        LIMIT $limit
+        """,
+        ids=doc_ids, limit=limit, collection=collection
+    )
+    return [
+        {"seed": record["seed"], "type": record["type"], "outgoing": record["outgoing"],
+         "node": public_properties(record["node"]), "labels": record["labels"]}
+        for record in result
+    ]
+
+
+def expand_from_documents(doc_ids: list[str], limit: int = DEFAULT_EXPANSION_LIMIT,
+                          collection: Optional[str] = None) -> list[dict]:
+    """Returns the graph neighbours of the given Document nodes with the connecting relationship.
+
+    With ``collection``, neighbours recording another collection are left out.
+    """
+    if not doc_ids:
+        return []
+    return execute_read(_neighbors, doc_ids, limit, collection)
+
+
+def _entity_key(entity: dict):
+    if entity.get("id") is not None:
+        return ("id", entity["id"])
+    return ("name", tuple(entity.get("labels", ())), entity.get("name"))
+
+
+def merge_context(documents: list[dict], entities: list[dict], neighbors: list[dict]) -> dict:
+    """Merges vector hits, graph hits and graph expansion into one deduplicated context.
+
+    Every document and entity carries 'sources' telling which retrieval path
+    produced it. Graph entities that are the same Document as a vector hit
+    are folded into that hit instead of being repeated.
+    """
+    merged_documents = {}
+    for doc in documents:
+        merged_documents[doc["id"]] = {**doc, "sources": ["vectorsearch"]}
+
+    merged_entities = {}
+
+    def add_entity(entity: dict, source: str):
+        if "Document" in entity.get("labels", ()) and entity.get("id") in merged_documents:
+            doc_sources = merged_documents[entity["id"]]["sources"]
+            if source not in doc_sources:
+                doc_sources.append(source)
+            return
+        key = _entity_key(entity)
+        if key in merged_entities:
+            if source not in merged_entities[key]["sources"]:
+                merged_entities[key]["sources"].append(source)
+        else:
+            merged_entities[key] = {**entity, "sources": [source]}
+
+    for entity in entities:
+        add_entity(entity, "graphsearch")
+
+    relationships = []
+    seen_relationships = set()
+    for neighbor in neighbors:
+        entity = {**neighbor["node"], "labels": neighbor["labels"]}
+        add_entity(entity, f"graph_expansion:{neighbor['seed']}")
+        target = entity.get("id") or entity.get("name")
+        source, destination = (neighbor["seed"], target) if neighbor["outgoing"] else (target, neighbor["seed"])
+        key = (source, neighbor["type"], destination)
+        if key not in seen_relationships:
+            seen_relationships.add(key)
+            relationships.append({"source": source, "type": neighbor["type"], "target": destination})
+
+    return {
+        "documents": list(merged_documents.values()),
+        "entities": list(merged_entities.values()),
+        "relationships": relationships,
+    }
+
+
+def _submit(executor, fn, *args, **kwargs):
+    # Each task runs in a copy of the caller's context, so it can mark the caller's result uncacheable
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def combined_search(query: str, vector_fn, graph_fn, vector_kwargs: dict = None, graph_limit: int = 5,
+                    expand_graph: bool = True, expansion_limit: int = DEFAULT_EXPANSION_LIMIT,
+                    collection: Optional[str] = None) -> dict:
+    """Runs vector and graph search concurrently and merges their results.
+
+    When ``expand_graph`` is set, the Document nodes of the vector hits seed a
+    one-hop graph expansion as soon as the vector search returns, overlapping
+    with the graph search still in flight. A failing branch does not fail the
+    call; its error is reported under 'errors' and the partial result is
+    kept out of the tool result cache. ``collection`` scopes the graph search
+    and the expansion; the vector search takes its own in ``vector_kwargs``.
+    """
+    executor = get_executor()
+    vector_future = _submit(executor, vector_fn, query, **(vector_kwargs or {}))
+    graph_future = _submit(executor, graph_fn, query, graph_limit, collection=collection)
+
+    errors = {}
+    documents, entities, neighbors = [], [], []
+    try:
+        documents = vector_future.result()
+    except Exception as e:
+        errors["vectorsearch"] = str(e)
+
+    expansion_future = None
+    if expand_graph and documents:
+        expansion_future = _submit(executor, expand_from_documents, [doc["id"] for doc in documents], expansion_limit, collection)
+
+    try:
+        entities = graph_future.result()
+    except Exception as e:
+        errors["graphsearch"] = str(e)
+
+    if expansion_future is not None:
+        try:
+            neighbors = expansion_future.result()
+        except Exception as e:
+            errors["graph_expansion"] = str(e)
+
+    context = merge_context(documents, entities, neighbors)
+    context["query"] = query
+    if errors:
+        context["errors"] = errors
+        mark_uncacheable()
+    return context
+
+
+def bind_collection(tool, collection: str):
+    """Returns ``tool`` with its 'collection' argument fixed, for an agent bound to that collection.
+
+    The parameter is removed from the signature the agent sees, so the
+    model cannot search another collection.
+    """
+    check_collection(collection)
+    signature = inspect.signature(tool)
+
+    @functools.wraps(tool)
+    def bound(*args, **kwargs):
+        return tool(*args, collection=collection, **kwargs)
+
+    bound.__signature__ = signature.replace(
+        parameters=[param for name, param in signature.parameters.items() if name != "collection"]
+    )
+    bound.__annotations__ = {name: hint for name, hint in tool.__annotations__.items() if name != "collection"}
+    return bound
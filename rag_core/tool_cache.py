@@ -0,0 +1,249 @@
+import contextvars
+import copy
+import functools
+import inspect
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+from rag_core.db_pool import pooled_connection
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+# --- Corpus version --- #
+
+def ensure_corpus_version(conn):
+    """Creates the single-row table holding the corpus version if it does not exist."""
+    with conn.cursor() as cur:
+        cur.execute(
+            "CREATE TABLE IF NOT EXISTS corpus_version ("
+            "id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id), version BIGINT NOT NULL);"
+        )
+        cur.execute("INSERT INTO corpus_version (id, version) VALUES (TRUE, 0) ON CONFLICT (id) DO NOTHING;")
+
+
+def read_corpus_version(conn) -> int:
+    with conn.cursor() as cur:
+        cur.execute("SELECT version FROM corpus_version WHERE id;")
+        return cur.fetchone()[0]
+
+
+def bump_corpus_version(conn=None) -> int:
+    """Increments the corpus version after documents or graph data changed.
+
+    The version lives in PostgreSQL, so a bump by an ingestion script also
+    invalidates the tool results cached by the API process.
+    """
+    if conn is None:
+        with pooled_connection() as conn:
+            return bump_corpus_version(conn)
+    ensure_corpus_version(conn)
+    with conn.cursor() as cur:
+        cur.execute("UPDATE corpus_version SET version = version + 1 WHERE id RETURNING version;")
+        version = cur.fetchone()[0]
+    _remember_version(version)
+    return version
+
+
+# Last version read by this process, so hot paths do not query it on every call
+_version_state = {"version": None, "read_at": 0.0, "schema_ready": False}
+_version_lock = threading.Lock()
+
+
+def _remember_version(version: int):
+    with _version_lock:
+        if _version_state["version"] is None or version >= _version_state["version"]:
+            _version_state["version"] = version
+            _version_state["read_at"] = time.monotonic()
+
+
+def current_corpus_version() -> int:
+    """Returns the corpus version, re-read from PostgreSQL at most every TOOL_CACHE_VERSION_TTL seconds.
+
+    TOOL_CACHE_VERSION_TTL defaults to 1; bumps made by this process are seen
+    at once, bumps made by another process after at most that long.
+    """
+    interval = float(os.environ.get("TOOL_CACHE_VERSION_TTL", "1"))
+    with _version_lock:
+        if _version_state["version"] is not None and time.monotonic() - _version_state["read_at"] < interval:
+            return _version_state["version"]
+    with pooled_connection() as conn:
+        if not _version_state["schema_ready"]:
+            ensure_corpus_version(conn)
+            _version_state["schema_ready"] = True
+        version = read_corpus_version(conn)
+    _remember_version(version)
+    return version
+
+
+# --- Uncacheable results --- #
+
+# Set by ``ToolResultCache.call`` for the tool call running in this context
+_call_state = contextvars.ContextVar("tool_cache_call_state", default=None)
+
+
+def mark_uncacheable():
+    """Keeps the result of the running cached tool call out of the cache.
+
+    For results that depend on timing rather than on the arguments and the
+    corpus, such as a fallback taken because a latency budget ran out. Work
+    submitted to other threads must run in a copy of the caller's context.
+    """
+    state = _call_state.get()
+    if state is not None:
+        state["cacheable"] = False
+
+
+# --- Result cache --- #
+
+def _normalize_arg(value):
+    if isinstance(value, str):
+        return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", value)).strip()
+    return value
+
+
+class ToolResultCache:
+    """Thread-safe LRU cache of tool results keyed by (tool, arguments, corpus version).
+
+    Results cached under an older corpus version are never returned; they
+    age out of the LRU. At most ``max_entries`` results are kept and entries
+    older than ``ttl`` seconds are treated as misses.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._bypassed = 0
+        self._uncached = 0
+        self._per_tool = {}
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl > 0 and time.time() - created > self.ttl
+
+    def _count(self, tool: str, outcome: str):
+        counts = self._per_tool.setdefault(tool, {"hits": 0, "misses": 0})
+        counts[outcome] += 1
+
+    def call(self, tool: str, arguments: dict, compute):
+        """Returns ``compute()`` for these arguments, from the cache when the corpus has not changed."""
+        try:
+            version = current_corpus_version()
+        except Exception:
+            # Without a version the cache cannot tell whether a result is stale
+            with self._lock:
+                self._bypassed += 1
+            return compute()
+
+        key = (tool, json.dumps({name: _normalize_arg(value) for name, value in arguments.items()},
+                                sort_keys=True, default=str), version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry[0]):
+                self._entries.move_to_end(key)
+                self._hits += 1
+                self._count(tool, "hits")
+                # Callers may modify what they get back
+                return copy.deepcopy(entry[1])
+            self._misses += 1
+            self._count(tool, "misses")
+
+        state = {"cacheable": True}
+        token = _call_state.set(state)
+        try:
+            result = compute()
+        finally:
+            _call_state.reset(token)
+        if not state["cacheable"]:
+            # A tool calling another cached tool inherits its uncacheable result
+            mark_uncacheable()
+            with self._lock:
+                self._uncached += 1
+            return result
+        with self._lock:
+            self._entries[key] = (time.time(), copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "bypassed": self._bypassed,
+                "uncached": self._uncached,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "tools": {tool: dict(counts) for tool, counts in self._per_tool.items()},
+            }
+
+
+# --- Process-wide cache --- #
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_tool_cache() -> Optional[ToolResultCache]:
+    """Returns the process-wide tool result cache, creating it on first use.
+
+    Configured with TOOL_CACHE_SIZE (results, default 512; 0 disables the
+    cache) and TOOL_CACHE_TTL (seconds, default 600; 0 disables expiry).
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                max_entries = int(os.environ.get("TOOL_CACHE_SIZE", "512"))
+                if max_entries <= 0:
+                    return None
+                _cache = ToolResultCache(max_entries, float(os.environ.get("TOOL_CACHE_TTL", "600")))
+    return _cache
+
+
+def cached_tool(tool):
+    """Decorates an agent tool so its results go through the process-wide cache.
+
+    The wrapper keeps the tool's name, signature and docstring, which is what
+    the agent sees. Arguments are bound with their defaults, so calls that
+    differ only in omitted defaults or in whitespace share an entry.
+    """
+    signature = inspect.signature(tool)
+
+    @functools.wraps(tool)
+    def wrapper(*args, **kwargs):
+        cache = get_tool_cache()
+        if cache is None:
+            return tool(*args, **kwargs)
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return cache.call(tool.__name__, bound.arguments, lambda: tool(*args, **kwargs))
+
+    return wrapper
+
+
+def get_tool_cache_stats() -> dict:
+    if _cache is None:
+        return {"initialized": False}
+    return {"initialized": True, **_cache.stats()}
@@ -0,0 +1,174 @@
+import asyncio
+import os
+import tempfile
+from typing import AsyncIterator, Iterable, Optional
+
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from .extraction import PAGE_EXTRACTORS, SIGNATURE_BYTES, matches_signature
+
+# Room for the multipart framing and the other form fields on top of the file
+UPLOAD_FORM_BYTES = 1024 * 1024
+# Form fields other than the file are short strings such as the subject
+UPLOAD_FIELD_MAX_BYTES = 64 * 1024
+
+
+class UploadError(Exception):
+    """Raised when an upload is malformed or its file is rejected."""
+
+
+class UploadTooLargeError(UploadError):
+    """Raised when an upload exceeds its size limit."""
+
+
+def too_large_message(max_bytes: int) -> str:
+    return f"File exceeds the maximum upload size of {max_bytes} bytes."
+
+
+def _decode(value: bytes, what: str) -> str:
+    try:
+        return value.decode("utf-8")
+    except UnicodeDecodeError:
+        raise UploadError(f"{what} is not valid UTF-8.")
+
+
+class UploadParser:
+    """Parses a multipart/form-data upload while the request body streams in.
+
+    The single file part, in the 'file' field, is collected in ``pending``
+    for the caller to spool. Its extension is checked against ``extensions``
+    as soon as its headers arrive, its magic bytes on its first bytes, and
+    the size limits on every piece received, so bad or oversized uploads are
+    rejected with ``UploadError`` before the rest of the body is read.
+    """
+
+    def __init__(self, boundary: bytes, max_bytes: int, extensions: Iterable[str] = PAGE_EXTRACTORS):
+        self.fields = {}
+        self.filename = None
+        self.file_extension = None
+        self.file_size = 0
+        self.finished = False
+        self.pending = []
+        self._max_bytes = max_bytes
+        self._extensions = list(extensions)
+        self._head = b""
+        self._signature_checked = False
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._part = None
+        self._value = b""
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_end": self._on_end,
+        })
+
+    def write(self, chunk: bytes):
+        try:
+            self._parser.write(chunk)
+        except MultipartParseError as e:
+            raise UploadError(f"Malformed upload: {e}")
+
+    def _on_part_begin(self):
+        self._headers, self._part, self._value = {}, None, b""
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field, self._header_value = b"", b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition"))
+        name = _decode(options.get(b"name", b""), "Form field name")
+        if b"filename" not in options:
+            self._part = ("field", name)
+            return
+        if name != "file" or self.filename is not None:
+            raise UploadError("Upload exactly one file, in the 'file' field.")
+        self.filename = _decode(options[b"filename"], "File name")
+        self.file_extension = os.path.splitext(self.filename)[1].lower()
+        if self.file_extension not in self._extensions:
+            raise UploadError(f"File type '{self.file_extension}' not supported. Supported types are {self._extensions}")
+        self._part = ("file", name)
+
+    def _check_signature(self):
+        if not matches_signature(self.file_extension, self._head[:SIGNATURE_BYTES]):
+            raise UploadError(f"File content does not match its '{self.file_extension}' extension.")
+        self._signature_checked = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._part is None or self._part[0] == "field":
+            self._value += data[start:end]
+            if len(self._value) > UPLOAD_FIELD_MAX_BYTES:
+                raise UploadError("Form field is too long.")
+            return
+        self.file_size += end - start
+        if self.file_size > self._max_bytes:
+            raise UploadTooLargeError(too_large_message(self._max_bytes))
+        if not self._signature_checked:
+            self._head += data[start:end]
+            if len(self._head) >= SIGNATURE_BYTES:
+                self._check_signature()
+        self.pending.append(data[start:end])
+
+    def _on_part_end(self):
+        if self._part is None:
+            return
+        if self._part[0] == "field":
+            self.fields[self._part[1]] = _decode(self._value, f"Form field '{self._part[1]}'")
+        elif self.file_size == 0:
+            raise UploadError("File is empty.")
+        elif not self._signature_checked:
+            self._check_signature()
+
+    def _on_end(self):
+        self.finished = True
+
+
+async def read_upload(content_type: Optional[str], body: AsyncIterator[bytes], max_bytes: int, spool_bytes: int,
+                      extensions: Iterable[str] = PAGE_EXTRACTORS):
+    """Reads a multipart upload from ``body`` with ``UploadParser``.
+
+    Returns the parser, with its form fields and file name, and the file in
+    a temporary file that stays in memory up to ``spool_bytes`` and moves to
+    disk beyond that; disk writes run in a worker thread. The whole body,
+    form fields included, is bounded by ``max_bytes`` plus
+    ``UPLOAD_FORM_BYTES`` whatever the Content-Length says, so chunked
+    uploads are limited too.
+    """
+    media_type, options = parse_options_header(content_type)
+    if media_type != b"multipart/form-data" or not options.get(b"boundary"):
+        raise UploadError("Expected a multipart/form-data upload.")
+    upload = UploadParser(options[b"boundary"], max_bytes, extensions)
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+    received = 0
+    try:
+        async for chunk in body:
+            received += len(chunk)
+            if received > max_bytes + UPLOAD_FORM_BYTES:
+                raise UploadTooLargeError(too_large_message(max_bytes))
+            upload.write(chunk)
+            if upload.pending:
+                await asyncio.to_thread(spool.write, b"".join(upload.pending))
+                upload.pending.clear()
+        if not upload.finished:
+            raise UploadError("Upload body is incomplete.")
+        if upload.filename is None:
+            raise UploadError("Missing 'file' field.")
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return upload, spool
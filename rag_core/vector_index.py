@@ -0,0 +1,219 @@
+import argparse
+import math
+from typing import Optional
+
+from psycopg2 import sql
+
+from rag_core.chunk_store import STORAGE_COLUMNS, check_collection, vector_storage
+from rag_core.db_pool import pooled_connection, close_pool
+
+INDEX_METHODS = ("hnsw", "ivfflat")
+
+# pgvector defaults; higher values trade build time and memory for recall.
+DEFAULT_HNSW_M = 16
+DEFAULT_HNSW_EF_CONSTRUCTION = 64
+# Largest hnsw.ef_search pgvector accepts
+MAX_EF_SEARCH = 1000
+
+# Operator class matching the distance each embedding column is searched with
+COLUMN_OPCLASSES = {
+    "embedding": "vector_cosine_ops",
+    "embedding_half": "halfvec_cosine_ops",
+    "embedding_bit": "bit_hamming_ops",
+}
+
+
+# PostgreSQL silently truncates longer identifiers, which could make two index names collide
+MAX_IDENTIFIER_LENGTH = 63
+
+
+def index_name(table: str, column: str, method: str, collection: Optional[str] = None) -> str:
+    if collection:
+        name = f"{table}_{column}_{method}_{check_collection(collection)}_idx"
+    else:
+        name = f"{table}_{column}_{method}_idx"
+    if len(name) > MAX_IDENTIFIER_LENGTH:
+        raise ValueError(f"Index name '{name}' is longer than {MAX_IDENTIFIER_LENGTH} characters")
+    return name
+
+
+def _check_method(method: str):
+    if method not in INDEX_METHODS:
+        raise ValueError(f"Unknown index method '{method}'. Supported methods are {list(INDEX_METHODS)}")
+
+
+def _run_ddl(conn, statement, params=None, concurrently: bool = False):
+    """Runs a DDL statement, switching to autocommit for CONCURRENTLY variants."""
+    if concurrently:
+        conn.commit()
+        conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(statement, params)
+    finally:
+        if concurrently:
+            conn.autocommit = False
+
+
+def _collection_filter(collection: Optional[str]):
+    if not collection:
+        return sql.SQL("")
+    return sql.SQL(" WHERE collection = {}").format(sql.Literal(check_collection(collection)))
+
+
+def default_ivfflat_lists(conn, table: str = "document_chunks", collection: Optional[str] = None) -> int:
+    """Follows the pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) above."""
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("SELECT count(*) FROM {}{}").format(sql.Identifier(table), _collection_filter(collection)))
+        rows = cur.fetchone()[0]
+    if rows <= 1_000_000:
+        return max(rows // 1000, 10)
+    return int(math.sqrt(rows))
+
+
+def create_index(conn, method: str = "hnsw", table: str = "document_chunks", column: str = "embedding",
+                 m: int = DEFAULT_HNSW_M, ef_construction: int = DEFAULT_HNSW_EF_CONSTRUCTION,
+                 lists: Optional[int] = None, concurrently: bool = False, opclass: Optional[str] = None,
+                 collection: Optional[str] = None) -> str:
+    """Creates an ANN index on ``table.column`` if it does not exist.
+
+    With ``collection`` the index is partial and covers only that
+    collection's rows, so searches filtered on it never visit other rows.
+
+    The operator class defaults to the one in COLUMN_OPCLASSES: cosine
+    distance for full and half-precision vectors, Hamming distance for
+    binary codes.
+
+    IVFFlat picks its centroids from the rows present at build time, so it
+    should be created (or rebuilt) after the table has been loaded. HNSW can be
+    created on an empty table and is maintained incrementally.
+    """
+    _check_method(method)
+    name = index_name(table, column, method, collection)
+    if method == "hnsw":
+        options = sql.SQL("m = {}, ef_construction = {}").format(sql.Literal(m), sql.Literal(ef_construction))
+    else:
+        if lists is None:
+            lists = default_ivfflat_lists(conn, table, collection)
+        options = sql.SQL("lists = {}").format(sql.Literal(lists))
+
+    statement = sql.SQL(
+        "CREATE INDEX {concurrently} IF NOT EXISTS {name} ON {table} USING {method} ({column} {opclass}) WITH ({options}){where}"
+    ).format(
+        concurrently=sql.SQL("CONCURRENTLY" if concurrently else ""),
+        name=sql.Identifier(name),
+        table=sql.Identifier(table),
+        method=sql.SQL(method),
+        column=sql.Identifier(column),
+        opclass=sql.SQL(opclass or COLUMN_OPCLASSES.get(column, "vector_cosine_ops")),
+        options=options,
+        where=_collection_filter(collection),
+    )
+    _run_ddl(conn, statement, concurrently=concurrently)
+    return name
+
+
+def create_collection_indexes(conn, collection: str, method: str = "hnsw", concurrently: bool = False) -> list[str]:
+    """Creates the partial chunk index searched for ``collection``, on the VECTOR_STORAGE column.
+
+    In compact modes the full vectors stay unindexed: they are only read to
+    rescore the candidates found through the compact column.
+    """
+    column = STORAGE_COLUMNS[vector_storage()]
+    return [create_index(conn, method, "document_chunks", column, concurrently=concurrently, collection=collection)]
+
+
+def drop_index(conn, method: str = "hnsw", table: str = "document_chunks", column: str = "embedding",
+               concurrently: bool = False, collection: Optional[str] = None) -> str:
+    """Drops the ANN index created by ``create_index`` if it exists."""
+    _check_method(method)
+    name = index_name(table, column, method, collection)
+    statement = sql.SQL("DROP INDEX {concurrently} IF EXISTS {name}").format(
+        concurrently=sql.SQL("CONCURRENTLY" if concurrently else ""),
+        name=sql.Identifier(name),
+    )
+    _run_ddl(conn, statement, concurrently=concurrently)
+    return name
+
+
+def rebuild_index(conn, method: str = "hnsw", table: str = "document_chunks", column: str = "embedding",
+                  concurrently: bool = True, collection: Optional[str] = None) -> str:
+    """Rebuilds an existing ANN index, e.g. to recompute IVFFlat centroids after bulk loads."""
+    _check_method(method)
+    name = index_name(table, column, method, collection)
+    statement = sql.SQL("REINDEX INDEX {concurrently} {name}").format(
+        concurrently=sql.SQL("CONCURRENTLY" if concurrently else ""),
+        name=sql.Identifier(name),
+    )
+    _run_ddl(conn, statement, concurrently=concurrently)
+    return name
+
+
+def list_indexes(conn, table: str = "document_chunks") -> list[dict]:
+    """Lists the HNSW/IVFFlat indexes defined on ``table`` with their on-disk size."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT i.indexname, i.indexdef, pg_relation_size(c.oid)
+            FROM pg_indexes i
+            JOIN pg_class c ON c.relname = i.indexname
+            WHERE i.tablename = %s AND (i.indexdef ILIKE '%%USING hnsw%%' OR i.indexdef ILIKE '%%USING ivfflat%%')
+            ORDER BY i.indexname
+            """,
+            (table,)
+        )
+        return [{"name": row[0], "definition": row[1], "size_bytes": row[2]} for row in cur.fetchall()]
+
+
+def apply_search_params(cur, ef_search: Optional[int] = None, probes: Optional[int] = None):
+    """Sets per-query recall knobs for the current transaction only.
+
+    ``ef_search`` sizes the HNSW candidate list (pgvector default 40) and
+    ``probes`` the number of IVFFlat lists visited (default 1). Larger values
+    improve recall at the cost of latency. ``ef_search`` is clamped to the
+    1-MAX_EF_SEARCH range pgvector accepts.
+    """
+    if ef_search is not None:
+        ef_search = min(max(int(ef_search), 1), MAX_EF_SEARCH)
+        cur.execute("SELECT set_config('hnsw.ef_search', %s, true)", (str(ef_search),))
+    if probes is not None:
+        cur.execute("SELECT set_config('ivfflat.probes', %s, true)", (str(int(probes)),))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the ANN indexes used by vector search.")
+    parser.add_argument("action", choices=["create", "drop", "rebuild", "list"])
+    parser.add_argument("--method", choices=INDEX_METHODS, default="hnsw", help="Index method. Defaults to 'hnsw'.")
+    parser.add_argument("--table", default="document_chunks", help="Table holding the embeddings. Defaults to 'document_chunks'.")
+    parser.add_argument("--column", default=None,
+                        help="Vector column: 'embedding', 'embedding_half' or 'embedding_bit'. Defaults to the VECTOR_STORAGE column.")
+    parser.add_argument("--m", type=int, default=DEFAULT_HNSW_M, help="HNSW max connections per layer.")
+    parser.add_argument("--ef-construction", type=int, default=DEFAULT_HNSW_EF_CONSTRUCTION, help="HNSW build candidate list size.")
+    parser.add_argument("--lists", type=int, default=None, help="IVFFlat list count. Derived from the row count if omitted.")
+    parser.add_argument("--concurrently", action="store_true", help="Build or drop without locking out writes.")
+    parser.add_argument("--collection", default=None, help="Partial index covering only this collection's rows.")
+    args = parser.parse_args()
+    if args.column is None:
+        args.column = STORAGE_COLUMNS[vector_storage()]
+
+    try:
+        with pooled_connection() as conn:
+            if args.action == "create":
+                name = create_index(conn, args.method, args.table, args.column, args.m, args.ef_construction, args.lists,
+                                    args.concurrently, collection=args.collection)
+                print(f"Index '{name}' is ready.")
+            elif args.action == "drop":
+                name = drop_index(conn, args.method, args.table, args.column, args.concurrently, args.collection)
+                print(f"Index '{name}' dropped.")
+            elif args.action == "rebuild":
+                name = rebuild_index(conn, args.method, args.table, args.column, args.concurrently, args.collection)
+                print(f"Index '{name}' rebuilt.")
+            else:
+                for index in list_indexes(conn, args.table):
+                    print(f"{index['name']} ({index['size_bytes']} bytes): {index['definition']}")
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()